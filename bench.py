@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""قياس أداء مسار التصدير محلياً دون اتصال بتليجرام"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import tempfile
+import argparse
+import threading
+import subprocess
+from contextlib import redirect_stdout
+
+from main import JsonSerializer, MessageRecord
+from fake_client import FakeTelegramClient, synthetic_messages
+
+# إعدادات كل وضع تصدير يتم قياسه
+EXPORT_MODES = {
+    'json': {'export_format': 'json'},
+    'jsonl': {'export_format': 'jsonl'},
+    'jsonl-inline': {'export_format': 'jsonl', 'export_writer_queue': '0'},
+    'sqlite': {'export_format': 'sqlite'},
+    'takeout': {'export_format': 'jsonl', 'takeout': True},
+}
+
+def peak_rss_mb():
+    """أقصى ذاكرة مستخدمة للعملية الحالية (غير متاح على Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # كيلوبايت على لينكس، بايت على macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+class FirstByteProbe:
+    """مراقبة مجلد التصدير في خيط منفصل لتسجيل لحظة وصول أول بايت إلى القرص"""
+
+    def __init__(self, directory, interval=0.001):
+        self.directory = directory
+        self.interval = interval
+        self.started = None
+        self.first_byte = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def run(self):
+        while not self._stop.is_set():
+            for entry in os.scandir(self.directory):
+                if entry.name.startswith('messages_') or entry.name.startswith('archive.db'):
+                    if entry.stat().st_size > 0:
+                        self.first_byte = time.perf_counter() - self.started
+                        return
+            time.sleep(self.interval)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+async def run_export(mode, args):
+    """تشغيل تصدير واحد على العميل الوهمي وإرجاع مقاييسه"""
+    from main import TelegramSuperScraper
+
+    settings = dict(EXPORT_MODES[mode])
+    takeout = settings.pop('takeout', False)
+
+    scraper = TelegramSuperScraper()
+    for key, value in settings.items():
+        scraper.config['SETTINGS'][key] = value
+    client = FakeTelegramClient(
+        messages=args.messages, page_size=args.page_size, latency=args.latency,
+        flood_every=args.flood_every, flood_seconds=args.flood_seconds,
+        arabic_ratio=args.arabic_ratio, mean_words=args.mean_words
+    )
+    scraper.current_client = client
+
+    probe = FirstByteProbe(scraper.exports_dir)
+    probe.start()
+    started = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+        if takeout:
+            stats = await scraper.export_takeout(['bench'], args.messages)
+        else:
+            stats = await scraper.export_chat('bench', args.messages)
+    elapsed = time.perf_counter() - started
+    probe.stop()
+
+    data = stats.to_dict()
+    return {
+        'mode': mode,
+        'messages': data['messages'],
+        'seconds': round(elapsed, 3),
+        'messages_per_sec': round(data['messages'] / elapsed) if elapsed else 0,
+        'peak_rss_mb': peak_rss_mb(),
+        'ttfb_ms': round(probe.first_byte * 1000, 1) if probe.first_byte is not None else None,
+        'requests': client.requests,
+        'flood_wait_seconds': data['flood_wait_seconds']
+    }
+
+def bench_export_one(args):
+    """وضع واحد داخل عملية مستقلة حتى يكون قياس الذاكرة القصوى خاصاً به"""
+    workdir = tempfile.mkdtemp(prefix='tss-bench-')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        result = asyncio.run(run_export(args.mode, args))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(result))
+    return 0
+
+def bench_export(args):
+    """قياس كل أوضاع التصدير: رسائل/ثانية، الذاكرة القصوى، زمن أول بايت"""
+    options = [
+        '--messages', str(args.messages), '--page-size', str(args.page_size),
+        '--latency', str(args.latency), '--flood-every', str(args.flood_every),
+        '--flood-seconds', str(args.flood_seconds), '--arabic-ratio', str(args.arabic_ratio),
+        '--mean-words', str(args.mean_words)
+    ]
+    results = []
+    print(f"messages: {args.messages} | page: {args.page_size} | latency: {args.latency}s")
+    print(f"{'mode':<14}{'msgs/s':>10}{'peak MB':>10}{'TTFB ms':>10}{'requests':>10}{'flood s':>9}")
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), 'export-one', '--mode', mode] + options,
+            check=True, capture_output=True, text=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"{mode:<14}{result['messages_per_sec']:>10,}{result['peak_rss_mb'] or '-':>10}"
+              f"{result['ttfb_ms'] if result['ttfb_ms'] is not None else '-':>10}"
+              f"{result['requests']:>10}{result['flood_wait_seconds']:>9}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        return compare_results(results, args.compare, args.tolerance)
+    return 0
+
+def compare_results(results, baseline_file, tolerance):
+    """مقارنة السرعة مع نتائج سابقة؛ رمز خروج 1 إذا تراجع أي وضع أكثر من الحد المسموح"""
+    with open(baseline_file, 'r', encoding='utf-8') as f:
+        baseline = {result['mode']: result for result in json.load(f)}
+
+    regressions = 0
+    for result in results:
+        previous = baseline.get(result['mode'])
+        if not previous or not previous['messages_per_sec']:
+            continue
+        change = result['messages_per_sec'] / previous['messages_per_sec'] - 1
+        if change < -tolerance:
+            regressions += 1
+            print(f"REGRESSION {result['mode']}: {previous['messages_per_sec']:,} -> "
+                  f"{result['messages_per_sec']:,} msgs/s ({change:+.0%})")
+    return 1 if regressions else 0
+
+def bench_json(args):
+    """مقارنة سرعة مكتبات JSON على سجلات رسائل اصطناعية"""
+    records = list(synthetic_messages(args.records))
+    # نفس الرسائل بالصيغة المضغوطة (صف لكل رسالة، بيانات المحادثة في رأس الملف)
+    rows = [MessageRecord.from_dict(record).to_row() for record in records]
+    variants = (('compact', records, False), ('pretty', records, True), ('rows', rows, False))
+    print(f"records: {len(records)}")
+    print(f"{'backend':<10}{'mode':<10}{'records/s':>14}{'MB/s':>10}{'size MB':>10}")
+
+    for backend in JsonSerializer.BACKENDS:
+        serializer = JsonSerializer(backend)
+        if serializer.name != backend:
+            print(f"{backend:<10}(غير مثبتة)")
+            continue
+        for mode, items, pretty in variants:
+            best = None
+            size = 0
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                size = sum(len(serializer.dumps(item, pretty).encode('utf-8')) for item in items)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{backend:<10}{mode:<10}{len(records) / best:>14,.0f}{size / best / 1e6:>10.1f}{size / 1e6:>10.2f}")
+    return 0
+
+def add_client_options(parser):
+    """خيارات العميل الوهمي المشتركة"""
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help='زمن كل طلب بالثواني')
+    parser.add_argument('--flood-every', type=int, default=0, help='FloodWait بعد كل N طلب (0 = بدون)')
+    parser.add_argument('--flood-seconds', type=int, default=1)
+    parser.add_argument('--arabic-ratio', type=float, default=0.7)
+    parser.add_argument('--mean-words', type=int, default=12)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='bench.py', description='Telegram Super Scraper benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    json_bench = subparsers.add_parser('json', help='مقارنة مكتبات JSON')
+    json_bench.add_argument('--records', type=int, default=100000)
+    json_bench.add_argument('--repeat', type=int, default=3)
+    json_bench.set_defaults(func=bench_json)
+
+    export = subparsers.add_parser('export', help='قياس أوضاع التصدير على عميل وهمي')
+    add_client_options(export)
+    export.add_argument('--modes', nargs='+', choices=list(EXPORT_MODES), default=list(EXPORT_MODES))
+    export.add_argument('--save', help='حفظ النتائج في ملف JSON')
+    export.add_argument('--compare', help='مقارنة مع نتائج محفوظة سابقاً')
+    export.add_argument('--tolerance', type=float, default=0.2, help='أقصى تراجع مسموح (0.2 = 20%%)')
+    export.set_defaults(func=bench_export)
+
+    export_one = subparsers.add_parser('export-one', help=argparse.SUPPRESS)
+    add_client_options(export_one)
+    export_one.add_argument('--mode', choices=list(EXPORT_MODES), required=True)
+    export_one.set_defaults(func=bench_export_one)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
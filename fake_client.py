@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""عميل تليجرام وهمي لتشغيل مسار التصدير وقياسه دون شبكة أو حساب حقيقي"""
+
+import zlib
+import random
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from telethon.requestiter import RequestIter
+
+ARABIC_WORDS = [
+    'مرحبا', 'بكم', 'في', 'المجموعة', 'اجتماع', 'الساعة', 'غدا', 'شكرا', 'جزيلا',
+    'الملف', 'مرفق', 'رابط', 'تحديث', 'جديد', 'الأسبوع', 'القادم', 'سؤال', 'إجابة'
+]
+LATIN_WORDS = [
+    'hello', 'meeting', 'link', 'update', 'release', 'notes', 'please', 'check',
+    'the', 'file', 'thanks', 'tomorrow', 'ok', 'done', 'see', 'attached'
+]
+
+START_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+def synthetic_text(rng, arabic_ratio=0.7, mean_words=12):
+    """نص رسالة عشوائي بطول متغير (توزيع أسي) مع خليط عربي/لاتيني"""
+    words = max(1, int(rng.expovariate(1 / mean_words)))
+    vocabulary = ARABIC_WORDS if rng.random() < arabic_ratio else LATIN_WORDS
+    return ' '.join(rng.choice(vocabulary) for _ in range(words))
+
+def synthetic_messages(count, seed=1, group_id=1001, group_name='مجموعة الاختبار'):
+    """سجلات رسائل بنفس شكل message_to_dict"""
+    rng = random.Random(seed)
+    for message_id in range(count, 0, -1):
+        yield {
+            'id': message_id,
+            'date': (START_DATE + timedelta(seconds=message_id * 37)).isoformat(),
+            'sender_id': rng.randint(1, 500),
+            'text': synthetic_text(rng),
+            'has_media': rng.random() < 0.15,
+            'group_id': group_id,
+            'group_name': group_name
+        }
+
+def fake_document(document_id, size):
+    """مرفق Telethon حقيقي (مستند) حتى تتعرف عليه مرحلة تحميل الوسائط"""
+    from telethon.tl.types import Document, MessageMediaDocument
+    return MessageMediaDocument(document=Document(
+        id=document_id, access_hash=document_id * 17, file_reference=b'', date=START_DATE,
+        mime_type='application/octet-stream', size=size, dc_id=2, attributes=[]
+    ))
+
+class FakeMessage:
+    """رسالة بالحقول التي يقرأها مسار التصدير"""
+
+    __slots__ = ('id', 'date', 'sender_id', 'text', 'media', 'edit_date', 'sender')
+
+    def __init__(self, message_id, date, sender_id, text, media, edit_date=None, sender=None):
+        self.id = message_id
+        self.date = date
+        self.sender_id = sender_id
+        self.text = text
+        self.media = media
+        self.edit_date = edit_date
+        self.sender = sender
+
+class FakeSession:
+    """ذاكرة الكيانات المحلية للجلسة: كل المستخدمين لهم access_hash معروف"""
+
+    def get_input_entity(self, peer):
+        from telethon.tl.types import InputPeerUser
+        if isinstance(peer, int) and peer > 0:
+            return InputPeerUser(peer, peer * 31)
+        raise ValueError(f'Could not find the input entity for {peer}')
+
+class FakeDialog:
+    """محادثة في قائمة الحوارات"""
+
+    def __init__(self, entity):
+        self.entity = entity
+        self.is_group = True
+        self.is_channel = True
+
+class FakeMessagesIter(RequestIter):
+    """نفس مكرر Telethon (RequestIter): طلب واحد لكل صفحة، والصفحة الأخيرة تنهي التكرار دون طلب إضافي"""
+
+    async def _init(self, entity, ids):
+        self.entity = entity
+        self.ids = ids
+        self.position = 0
+
+    async def _load_next_chunk(self):
+        await self.client.request()
+        page = self.ids[self.position:self.position + self.client.page_size]
+        self.position += len(page)
+        self.buffer.extend(self.client.make_message(self.entity.id, message_id) for message_id in page)
+        return self.position >= len(self.ids)
+
+class FakeTakeout:
+    """سياق Takeout وهمي: وكيل للعميل يسجل نتيجة إنهاء الجلسة مثل Telethon"""
+
+    def __init__(self, client, finalize=True):
+        self.client = client
+        self.finalize = finalize
+        self.success = None
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    async def __aenter__(self):
+        self.client.takeout_sessions += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self.success is None and self.finalize:
+            self.success = exc_type is None
+        self.client.takeout_results.append(self.success)
+        return False
+
+class FakeTelegramClient:
+    """بديل محلي لـ TelegramClient مع زمن استجابة وحجم صفحة و FloodWait قابلة للضبط"""
+
+    def __init__(self, messages=10000, page_size=100, latency=0.0, flood_every=0, flood_seconds=1,
+                 arabic_ratio=0.7, mean_words=12, media_ratio=0.15, senders=500, seed=1, media_files=1000,
+                 unknown_every=50, missing_chats=(), basic_chats=()):
+        self.messages = messages
+        self.page_size = page_size
+        self.latency = latency
+        self.flood_every = flood_every
+        self.flood_seconds = flood_seconds
+        self.arabic_ratio = arabic_ratio
+        self.mean_words = mean_words
+        self.media_ratio = media_ratio
+        self.senders = senders
+        self.seed = seed
+        self.media_files = media_files
+        # المرسلون بمعرف من مضاعفات هذا الرقم يصلون دون كيان مع الصفحة
+        self.unknown_every = unknown_every
+        # روابط لا يجدها get_entity (محادثة محذوفة أو اسم مستخدم خاطئ)
+        self.missing_chats = set(missing_chats)
+        # روابط تُحل إلى مجموعة عادية (Chat) بدل مجموعة خارقة
+        self.basic_chats = set(basic_chats)
+        self.session = FakeSession()
+        self.users = {}
+        self.requests = 0
+        self.flood_waits = 0
+        self.takeout_sessions = 0
+        self.takeout_results = []
+        self.downloads = 0
+        self.entity_batches = 0
+        self.handlers = []
+        self._disconnected = None
+
+    def user(self, user_id):
+        from telethon.tl.types import User
+        if user_id not in self.users:
+            self.users[user_id] = User(id=user_id, access_hash=user_id * 31, first_name=f'مستخدم {user_id}')
+        return self.users[user_id]
+
+    def make_message(self, chat_id, message_id):
+        # نفس المعرف ينتج نفس الرسالة دائماً بغض النظر عن ترتيب الجلب
+        rng = random.Random(self.seed * 1000003 + chat_id * 7919 + message_id)
+        media = None
+        if rng.random() < self.media_ratio:
+            # مجموعة ملفات محدودة حتى تتكرر المرفقات المعاد توجيهها بين الرسائل والمحادثات
+            document_id = rng.randint(1, self.media_files)
+            media = fake_document(document_id, random.Random(document_id).randint(10_000, 5_000_000))
+        sender_id = rng.randint(1, self.senders)
+        known = not self.unknown_every or sender_id % self.unknown_every
+        return FakeMessage(
+            message_id,
+            START_DATE + timedelta(seconds=message_id * 37),
+            sender_id,
+            synthetic_text(rng, self.arabic_ratio, self.mean_words),
+            media,
+            sender=self.user(sender_id) if known else None
+        )
+
+    async def request(self):
+        """محاكاة طلب شبكة واحد: زمن استجابة ثم FloodWait دوري إن طُلب"""
+        from telethon.errors import FloodWaitError
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.flood_every and self.requests % self.flood_every == 0:
+            self.flood_waits += 1
+            raise FloodWaitError(None, self.flood_seconds)
+
+    async def get_entity(self, link):
+        from telethon.tl.types import Channel, Chat, ChatPhotoEmpty
+        if isinstance(link, list):
+            # مثل Telethon: طلب users.getUsers واحد لكل 200 مستخدم
+            self.entity_batches += 1
+            for _ in range(0, len(link), 200):
+                await self.request()
+            return [self.user(peer.user_id) for peer in link]
+        await self.request()
+        if link in self.missing_chats:
+            raise ValueError(f'No user has "{link}" as username')
+        chat_id = zlib.crc32(str(link).encode('utf-8')) % 1_000_000 + 1
+        if link in self.basic_chats:
+            return Chat(id=chat_id, title=f'مجموعة {link}', photo=ChatPhotoEmpty(), participants_count=10,
+                        date=None, version=1)
+        return Channel(id=chat_id, title=f'مجموعة {link}', photo=ChatPhotoEmpty(), date=None,
+                       access_hash=chat_id * 31, megagroup=True)
+
+    async def iter_dialogs(self):
+        for index in range(3):
+            entity = await self.get_entity(f'dialog{index}')
+            yield FakeDialog(entity)
+
+    def iter_messages(self, entity, limit=None, offset_id=0, min_id=0, max_id=0, reverse=False,
+                      wait_time=None, **kwargs):
+        """نفس دلالات Telethon لـ offset_id/min_id/max_id/reverse على معرفات 1..messages"""
+        upper = self.messages
+        if max_id:
+            upper = min(upper, max_id - 1)
+        lower = min_id + 1
+        if reverse:
+            if offset_id:
+                lower = max(lower, offset_id + 1)
+            ids = range(lower, upper + 1)
+        else:
+            if offset_id:
+                upper = min(upper, offset_id - 1)
+            ids = range(upper, lower - 1, -1)
+        if limit is not None:
+            ids = ids[:limit]
+        return FakeMessagesIter(self, limit, wait_time=wait_time, entity=entity, ids=ids)
+
+    async def iter_download(self, media, offset=0, request_size=512 * 1024, **kwargs):
+        """محتوى ثابت لكل مستند (نفس المعرف = نفس البايتات) مع دعم offset للاستئناف"""
+        document = media.document
+        self.downloads += 1
+        payload = random.Random(document.id).randbytes(min(document.size, 256)) or b'0'
+        position = offset
+        while position < document.size:
+            await self.request()
+            end = min(document.size, position + request_size)
+            start = position % len(payload)
+            yield (payload * ((end - position) // len(payload) + 2))[start:start + end - position]
+            position = end
+
+    @property
+    def disconnected(self):
+        """مثل Telethon: Future تكتمل عند انقطاع الاتصال (لا ينقطع العميل الوهمي)"""
+        if self._disconnected is None:
+            self._disconnected = asyncio.get_running_loop().create_future()
+        return self._disconnected
+
+    def is_connected(self):
+        return True
+
+    def add_event_handler(self, callback, event):
+        self.handlers.append((callback, event))
+
+    def remove_event_handler(self, callback, event):
+        self.handlers.remove((callback, event))
+
+    async def dispatch(self, event):
+        """مثل Telethon: كل معالج مسجل لنوع الحدث يمر أولاً بفلتر الباني (ومنه chats=)"""
+        for callback, builder in list(self.handlers):
+            if type(event) is not type(builder).Event:
+                continue
+            await builder.resolve(self)
+            if builder.filter(event):
+                await callback(event)
+
+    def takeout(self, finalize=True, **kwargs):
+        return FakeTakeout(self, finalize)
+
+    async def disconnect(self):
+        pass
@@ -2,56 +2,1739 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 import sys
 import json
+import time
+import bisect
+import sqlite3
 import asyncio
+import threading
+import argparse
+import functools
+import contextlib
 import configparser
-from datetime import datetime
-from colorama import init, Fore, Style
-from telethon import TelegramClient
-from telethon.tl.functions.channels import InviteToChannelRequest
-from telethon.tl.types import InputPeerUser, InputPeerEmpty
-from telethon.errors import (
-    FloodWaitError, ChannelPrivateError, UserNotParticipantError,
-    UserPrivacyRestrictedError, ChatAdminRequiredError
-)
-
-# محاولة استيراد مكتبات إصلاح النص العربي
-try:
-    import arabic_reshaper
-    from bidi.algorithm import get_display
-    
-    def format_arabic(text):
-        """تنسيق النص العربي للعرض الصحيح"""
-        reshaped = arabic_reshaper.reshape(text)
-        return get_display(reshaped)
-except ImportError:
-    def format_arabic(text):
-        """بديل إذا لم تكن المكتبات مثبتة"""
-        return text
-
-# تهيئة Colorama
-init(autoreset=True)
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+# ملاحظة: Telethon و colorama ومكتبات النص العربي تُستورد عند الحاجة فقط
+# حتى يبقى بدء التشغيل سريعاً للأوامر غير التفاعلية
+
+# الحد الأقصى المسموح لزمن استيراد هذا الملف (بالمللي ثانية)
+IMPORT_TIME_BUDGET_MS = 150
+
+# رموز الخروج للأوامر غير التفاعلية
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_AUTH = 3
+EXIT_PARTIAL = 4
+
+def stale_peer_errors():
+    """أخطاء تعني أن الكيان المخزن لم يعد صالحاً (تغير المعرف أو access_hash)"""
+    from telethon.errors import (
+        ChannelInvalidError, ChannelPrivateError, PeerIdInvalidError,
+        UsernameNotOccupiedError, UsernameInvalidError
+    )
+    return (
+        ChannelInvalidError, ChannelPrivateError, PeerIdInvalidError,
+        UsernameNotOccupiedError, UsernameInvalidError
+    )
+
+# الحروف العربية وأشكال العرض الخاصة بها
+ARABIC_CHARS = re.compile('[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]')
+DIGIT_RUNS = re.compile('[0-9]+')
+PLACEHOLDER_DIGITS = re.compile('[0-9]')
+# ملفات التصدير: لقطات بتاريخ التشغيل أو الأرشيف المدمج لكل محادثة
+EXPORT_FILE_PATTERN = re.compile(r'^messages_(-?\d+)_(\d{8}_\d{6}|archive)\.(jsonl|json)$')
+
+class ArabicFormatter:
+    """تنسيق النص العربي مع ذاكرة LRU محدودة وتخطٍ سريع للنصوص غير العربية
+
+    الأرقام في النصوص المتغيرة (مثل 'تم جمع 1500 رسالة') تُستبدل برقم واحد قبل التنسيق
+    ثم تُعاد بعده، فيبقى في الذاكرة قالب واحد لكل رسالة بدلاً من نسخة لكل رقم.
+    يصح ذلك لأن خوارزمية bidi تعامل أي سلسلة أرقام لاتينية كوحدة واحدة بغض النظر عن طولها.
+    """
+
+    def __init__(self, display, maxsize=1024):
+        self.display = display
+        self.cached_display = functools.lru_cache(maxsize=maxsize)(display)
+        self.skipped = 0
+        self.uncached = 0
+
+    def __call__(self, text):
+        if text.isascii() or not ARABIC_CHARS.search(text):
+            self.skipped += 1
+            return text
+        
+        numbers = DIGIT_RUNS.findall(text)
+        if not numbers:
+            return self.cached_display(text)
+        if len(numbers) > 10:
+            self.uncached += 1
+            return self.display(text)
+        
+        # كل سلسلة أرقام تصبح رقماً واحداً يدل على ترتيبها، لأن bidi قد يعكس ترتيب السلاسل
+        index = iter('0123456789')
+        template = DIGIT_RUNS.sub(lambda m: next(index), text)
+        shaped = self.cached_display(template)
+        return PLACEHOLDER_DIGITS.sub(lambda m: numbers[int(m.group())], shaped)
+
+    def stats(self):
+        info = self.cached_display.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': round(info.hits / lookups, 3) if lookups else 0.0,
+            'cached': info.currsize,
+            'maxsize': info.maxsize,
+            'skipped': self.skipped,
+            'uncached': self.uncached
+        }
+
+def load_arabic_formatter():
+    """محاولة استيراد مكتبات إصلاح النص العربي"""
+    try:
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+    except ImportError:
+        # بديل إذا لم تكن المكتبات مثبتة
+        return lambda text: text
+    return ArabicFormatter(lambda text: get_display(arabic_reshaper.reshape(text)))
+
+_arabic_formatter = None
+
+def format_arabic(text):
+    """تنسيق النص العربي للعرض الصحيح"""
+    global _arabic_formatter
+    if _arabic_formatter is None:
+        _arabic_formatter = load_arabic_formatter()
+    return _arabic_formatter(text)
+
+def arabic_format_stats():
+    """إحصاءات ذاكرة التنسيق العربي (None إذا لم تُستخدم أو لم تكن المكتبات مثبتة)"""
+    if isinstance(_arabic_formatter, ArabicFormatter):
+        return _arabic_formatter.stats()
+    return None
+
+def init_colors():
+    """تهيئة Colorama (تحويل الألوان على Windows وحذفها عند توجيه المخرجات لملف)"""
+    try:
+        from colorama import init
+    except ImportError:
+        return
+    init(autoreset=True)
 
 class Colors:
-    """ألوان للواجهة"""
-    RED = Fore.RED
-    GREEN = Fore.GREEN
-    YELLOW = Fore.YELLOW
-    BLUE = Fore.BLUE
-    MAGENTA = Fore.MAGENTA
-    CYAN = Fore.CYAN
-    WHITE = Fore.WHITE
-    RESET = Fore.RESET
+    """ألوان للواجهة (رموز ANSI نفسها التي يعرّفها colorama.Fore)"""
+    RED = '\x1b[31m'
+    GREEN = '\x1b[32m'
+    YELLOW = '\x1b[33m'
+    BLUE = '\x1b[34m'
+    MAGENTA = '\x1b[35m'
+    CYAN = '\x1b[36m'
+    WHITE = '\x1b[37m'
+    RESET = '\x1b[39m'
+
+class ProgressReporter:
+    """تقرير تقدم بحسب الزمن لا بعدد العناصر: المعدل والوقت المتبقي وزمن FloodWait
+
+    كلفة update لكل عنصر زيادة عداد ومقارنة فقط؛ الوقت يُفحص كل عدة عناصر
+    بحسب المعدل الحالي، ولا يُفحص أبداً عند تعطيل العرض.
+    """
+
+    def __init__(self, emit, unit, total=None, interval=1.0, enabled=True, stats=None):
+        self.emit = emit
+        self.unit = unit
+        self.total = total
+        self.interval = interval
+        self.stats = stats
+        self.count = 0
+        self.started = time.monotonic()
+        self._next_time = self.started + interval
+        self._next_check = 1 if enabled else float('inf')
+
+    def update(self, n=1):
+        self.count += n
+        if self.count >= self._next_check:
+            self.check()
+
+    def check(self):
+        now = time.monotonic()
+        elapsed = now - self.started
+        rate = self.count / elapsed if elapsed > 0 else 0.0
+        # فحص الوقت نحو عشر مرات في كل فترة عرض
+        self._next_check = self.count + max(1, int(rate * self.interval / 10))
+        if now < self._next_time:
+            return
+        self._next_time = now + self.interval
+        
+        message = f'تم جمع {self.count} {self.unit} ({rate:.0f}/ث)'
+        if self.total and rate > 0:
+            remaining = max(0, self.total - self.count) / rate
+            message += f' | المتبقي ~{remaining:.0f} ث'
+        if self.stats and self.stats.flood_wait_seconds:
+            message += f' | FloodWait: {self.stats.flood_wait_seconds} ث'
+        self.emit('progress', message)
+
+class LatencyHistogram:
+    """توزيع أزمنة عملية واحدة على حدود ثابتة (نفس حدود Prometheus الافتراضية)"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    __slots__ = ('counts', 'count', 'total', 'max', 'errors')
 
-class TelegramSuperScraper:
     def __init__(self):
-        self.config_file = 'config.ini'
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def to_dict(self):
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            'calls': self.count,
+            'errors': self.errors,
+            'total_seconds': round(self.total, 3),
+            'mean_ms': round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 2),
+            'buckets': buckets
+        }
+
+class MetricsTimer:
+    """قياس زمن كتلة with وتسجيله في التوزيع، مع عد الاستثناءات"""
+
+    __slots__ = ('metrics', 'name', 'started')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        histogram = self.metrics.observe(self.name, time.monotonic() - self.started)
+        if exc_type is not None:
+            histogram.errors += 1
+        return False
+
+class Metrics:
+    """قياسات التشغيل: عدد الطلبات وتوزيع أزمنتها، البايتات المكتوبة، ثواني FloodWait
+
+    معطلة افتراضياً؛ عندها كل نقطة قياس فحص خاصية واحدة فقط، و timer يعيد
+    سياقاً فارغاً مشتركاً دون قراءة الساعة.
+    """
+
+    PREFIX = 'telegram_scraper'
+
+    def __init__(self, enabled=False):
+        self.configure(enabled)
+
+    def configure(self, enabled):
+        """تفعيل أو تعطيل القياس مع تصفير ما سبق"""
+        self.enabled = enabled
+        self.started = time.monotonic()
+        self.started_at = datetime.now().isoformat()
+        self.histograms = {}
+        self.bytes_written = {}
+        self.flood_waits = {}
+
+    def observe(self, name, seconds):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.observe(seconds)
+        return histogram
+
+    def timer(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        return MetricsTimer(self, name)
+
+    def add_bytes(self, target, count):
+        if self.enabled:
+            self.bytes_written[target] = self.bytes_written.get(target, 0) + count
+
+    def add_file(self, target, path):
+        """احتساب حجم ملف اكتملت كتابته"""
+        if self.enabled and os.path.exists(path):
+            self.add_bytes(target, os.path.getsize(path))
+
+    def flood_wait(self, source, seconds):
+        if self.enabled:
+            self.flood_waits[source] = self.flood_waits.get(source, 0) + seconds
+
+    def to_dict(self):
+        return {
+            'started_at': self.started_at,
+            'elapsed_seconds': round(time.monotonic() - self.started, 3),
+            'operations': {name: histogram.to_dict() for name, histogram in sorted(self.histograms.items())},
+            'bytes_written': dict(sorted(self.bytes_written.items())),
+            'flood_wait_seconds': dict(sorted(self.flood_waits.items()))
+        }
+
+    def to_prometheus(self):
+        """صيغة textfile لـ node_exporter (أو أي جامع يقرأ صيغة Prometheus النصية)"""
+        prefix = self.PREFIX
+        lines = [
+            f'# HELP {prefix}_operation_seconds زمن طلبات تليجرام وعمليات الكتابة',
+            f'# TYPE {prefix}_operation_seconds histogram'
+        ]
+        for name, histogram in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}_operation_seconds_bucket{{operation="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_operation_seconds_sum{{operation="{name}"}} {histogram.total:.6f}')
+            lines.append(f'{prefix}_operation_seconds_count{{operation="{name}"}} {histogram.count}')
+
+        lines.append(f'# HELP {prefix}_operation_errors_total عمليات انتهت باستثناء')
+        lines.append(f'# TYPE {prefix}_operation_errors_total counter')
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f'{prefix}_operation_errors_total{{operation="{name}"}} {histogram.errors}')
+
+        lines.append(f'# HELP {prefix}_bytes_written_total البايتات المكتوبة على القرص')
+        lines.append(f'# TYPE {prefix}_bytes_written_total counter')
+        for target, count in sorted(self.bytes_written.items()):
+            lines.append(f'{prefix}_bytes_written_total{{target="{target}"}} {count}')
+
+        lines.append(f'# HELP {prefix}_flood_wait_seconds_total مهل FloodWait التي فرضها تليجرام')
+        lines.append(f'# TYPE {prefix}_flood_wait_seconds_total counter')
+        for source, seconds in sorted(self.flood_waits.items()):
+            lines.append(f'{prefix}_flood_wait_seconds_total{{source="{source}"}} {seconds}')
+        return '\n'.join(lines) + '\n'
+
+NULL_TIMER = contextlib.nullcontext()
+
+# قياسات العملية الحالية؛ يفعّلها TelegramSuperScraper من الإعدادات
+metrics = Metrics()
+
+class JsonSerializer:
+    """واجهة موحدة لتحويل JSON: orjson أو msgspec إن وُجدت وإلا المكتبة القياسية"""
+
+    BACKENDS = ('orjson', 'msgspec', 'json')
+
+    def __init__(self, backend='auto'):
+        candidates = self.BACKENDS if backend == 'auto' else (backend, 'json')
+        for name in candidates:
+            try:
+                getattr(self, f'use_{name}')()
+            except (ImportError, AttributeError):
+                continue
+            self.name = name
+            break
+
+    def use_orjson(self):
+        import orjson
+        self._compact = lambda obj: orjson.dumps(obj).decode('utf-8')
+        self._pretty = lambda obj: orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+        self.loads = orjson.loads
+
+    def use_msgspec(self):
+        import msgspec
+        encoder = msgspec.json.Encoder()
+        self._compact = lambda obj: encoder.encode(obj).decode('utf-8')
+        self._pretty = lambda obj: msgspec.json.format(encoder.encode(obj), indent=2).decode('utf-8')
+        self.loads = msgspec.json.decode
+
+    def use_json(self):
+        self._compact = lambda obj: json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+        self._pretty = lambda obj: json.dumps(obj, ensure_ascii=False, indent=2)
+        self.loads = json.loads
+
+    def dumps(self, obj, pretty=False):
+        """تحويل إلى نص JSON؛ مضغوط افتراضياً ومنسق للقراءة عند الطلب"""
+        return self._pretty(obj) if pretty else self._compact(obj)
+
+    def dump(self, obj, f, pretty=False):
+        f.write(self.dumps(obj, pretty))
+
+    def load(self, f):
+        return self.loads(f.read())
+
+_serializers = {}
+
+def get_serializer(backend='auto'):
+    """مُسلسِل JSON مشترك لكل مكتبة (يُنشأ مرة واحدة)"""
+    if backend not in _serializers:
+        _serializers[backend] = JsonSerializer(backend)
+    return _serializers[backend]
+
+class MessageRecord:
+    """رسالة مصدّرة بشكل مضغوط: حقول ثابتة بلا قاموس لكل رسالة، والتاريخ ثوانٍ منذ 1970 (UTC)
+
+    بيانات المحادثة لا تتكرر مع كل رسالة؛ تُكتب مرة واحدة في رأس الملف، وكل رسالة
+    صف قصير بترتيب FIELDS. to_dict يعيد الشكل القديم للتوافق.
+    """
+
+    __slots__ = ('id', 'date', 'sender_id', 'text', 'has_media')
+    FIELDS = __slots__
+    SCHEMA = 'compact-v1'
+
+    def __init__(self, message_id, date, sender_id, text, has_media):
+        self.id = message_id
+        self.date = date
+        self.sender_id = sender_id
+        self.text = text
+        self.has_media = has_media
+
+    @classmethod
+    def from_message(cls, message):
+        return cls(
+            message.id,
+            int(message.date.timestamp()) if message.date else None,
+            message.sender_id,
+            message.text or '',
+            bool(message.media)
+        )
+
+    @classmethod
+    def from_row(cls, row):
+        message_id, date, sender_id, text, has_media = row
+        return cls(message_id, date, sender_id, text, bool(has_media))
+
+    @classmethod
+    def from_dict(cls, msg):
+        """من سجل بالشكل القديم (تاريخ ISO)"""
+        date = msg.get('date')
+        if date:
+            date = int(datetime.fromisoformat(date).timestamp())
+        return cls(msg['id'], date, msg.get('sender_id'), msg.get('text') or '', bool(msg.get('has_media')))
+
+    @classmethod
+    def header(cls, chat_id, chat_title):
+        """رأس الملف: بيانات المحادثة وأسماء الأعمدة مرة واحدة"""
+        return {'schema': cls.SCHEMA, 'chat': {'id': chat_id, 'title': chat_title}, 'fields': list(cls.FIELDS)}
+
+    def to_row(self):
+        return [self.id, self.date, self.sender_id, self.text, 1 if self.has_media else 0]
+
+    @property
+    def iso_date(self):
+        if self.date is None:
+            return None
+        return datetime.fromtimestamp(self.date, timezone.utc).isoformat()
+
+    def to_dict(self, chat_id, chat_title):
+        """الشكل القديم لسجل الرسالة"""
+        return {
+            'id': self.id,
+            'date': self.iso_date,
+            'sender_id': self.sender_id,
+            'text': self.text,
+            'has_media': self.has_media,
+            'group_id': chat_id,
+            'group_name': chat_title
+        }
+
+def check_export_schema(header, path):
+    if header.get('schema') != MessageRecord.SCHEMA or header.get('fields') != list(MessageRecord.FIELDS):
+        raise ValueError(f'صيغة تصدير غير مدعومة في {path}: {header.get("schema")}')
+
+JSON_ROWS_KEY = re.compile(r'"rows"\s*:\s*\[')
+JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+def iter_json_batches(f, path, chunk_size=1 << 20, batch_size=10000):
+    """قراءة لقطة JSON كاملة كتدفق دون تحميلها في الذاكرة
+
+    أول قيمة هي الرأس (None للشكل القديم: مصفوفة قواميس)، ثم دفعات من عناصر المصفوفة.
+    كل عنصر يُحلل بـ raw_decode من مخزن بحجم chunk_size؛ العنصر المقطوع عند حد المخزن
+    يُعاد تحليله بعد قراءة المخزن التالي. الرأس هو ما يسبق مفتاح rows (آخر مفتاح يكتبه التصدير).
+    """
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size)
+    if buffer.lstrip().startswith('['):
+        header = None
+        pos = buffer.index('[') + 1
+    else:
+        match = JSON_ROWS_KEY.search(buffer)
+        while not match:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError(f'ملف تصدير بلا رسائل: {path}')
+            buffer += chunk
+            match = JSON_ROWS_KEY.search(buffer)
+        header = decoder.decode(buffer[:match.start()].rstrip().rstrip(',') + '}')
+        pos = match.end()
+    yield header
+    
+    batch = []
+    while True:
+        pos = JSON_SEPARATORS.match(buffer, pos).end()
+        if pos == len(buffer):
+            buffer, pos = f.read(chunk_size), 0
+            if not buffer:
+                raise ValueError(f'ملف تصدير مقطوع: {path}')
+            continue
+        if buffer[pos] == ']':
+            break
+        try:
+            item, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError(f'ملف تصدير تالف: {path}')
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def iter_export(path, serializer=None):
+    """قراءة ملف تصدير بأي صيغة (مضغوطة أو قديمة، JSON أو JSONL) كأزواج (المحادثة، MessageRecord)"""
+    serializer = serializer or get_serializer()
+    with open(path, 'r', encoding='utf-8') as f:
+        if not path.endswith('.jsonl'):
+            batches = iter_json_batches(f, path)
+            header = next(batches)
+            if header is not None:
+                check_export_schema(header, path)
+                for rows in batches:
+                    for row in rows:
+                        yield header['chat'], MessageRecord.from_row(row)
+            else:
+                for messages in batches:
+                    for msg in messages:
+                        yield {'id': msg['group_id'], 'title': msg['group_name']}, MessageRecord.from_dict(msg)
+            return
+        
+        chat = None
+        for line in f:
+            if not line.strip():
+                continue
+            item = serializer.loads(line)
+            if isinstance(item, list):
+                yield chat, MessageRecord.from_row(item)
+            elif 'schema' in item:
+                check_export_schema(item, path)
+                chat = item['chat']
+            elif 'event' in item:
+                raise ValueError(f'{path} سجل أحداث متابعة (tail) وليس ملف تصدير')
+            else:
+                yield {'id': item['group_id'], 'title': item['group_name']}, MessageRecord.from_dict(item)
+
+def iter_export_rows(path, serializer=None, chunk_bytes=1 << 20):
+    """مثل iter_export لكن بدفعات من الصفوف المضغوطة بدل كائن لكل رسالة (للتجميع السريع)
+
+    في JSONL المضغوط تُحلَّل كل دفعة سطور باستدعاء loads واحد كمصفوفة JSON،
+    وفي لقطة JSON المضغوطة تُمرر دفعات iter_json_batches كما هي.
+    """
+    serializer = serializer or get_serializer()
+    header = None
+    if path.endswith('.json'):
+        with open(path, 'r', encoding='utf-8') as f:
+            batches = iter_json_batches(f, path, chunk_bytes)
+            header = next(batches)
+            if header is not None:
+                check_export_schema(header, path)
+                for rows in batches:
+                    yield header['chat'], rows
+                return
+    elif path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            first = f.readline()
+            header = serializer.loads(first) if first.strip() else None
+            if isinstance(header, dict) and 'schema' in header:
+                check_export_schema(header, path)
+                while True:
+                    lines = [line for line in f.readlines(chunk_bytes) if line.strip()]
+                    if not lines:
+                        break
+                    yield header['chat'], serializer.loads('[' + ','.join(lines) + ']')
+                return
+    
+    # الصيغ الأخرى تمر عبر iter_export وتُجمع في دفعات
+    chat, rows = None, []
+    for chat, record in iter_export(path, serializer):
+        rows.append(record.to_row())
+        if len(rows) >= 10000:
+            yield chat, rows
+            rows = []
+    if rows:
+        yield chat, rows
+
+def read_export(path, serializer=None):
+    """قراءة ملف تصدير بأي صيغة وإرجاع الرسائل بالشكل القديم (قاموس لكل رسالة)"""
+    for chat, record in iter_export(path, serializer):
+        yield record.to_dict(chat['id'], chat['title'])
+
+def render_txt_message(record, names=None):
+    """تحويل رسالة واحدة إلى سطور الملف النصي؛ names خريطة المعرف إلى اسم العرض"""
+    name = names.get(record.sender_id) if names else None
+    return (
+        f"[{record.iso_date}] {name or f'User_{record.sender_id}'}:\n"
+        f"{record.text[:200]}\n"
+        + "-"*40 + "\n"
+    )
+
+class ExportCompactor:
+    """دمج لقطات تصدير متداخلة لمحادثة واحدة في ملف واحد مرتب بلا تكرار
+
+    فرز خارجي: كل ملف يُقرأ كتدفق ويُقسم إلى دفعات مرتبة تُكتب في ملفات مؤقتة،
+    ثم دمج k-طرق بـ heapq.merge. الذاكرة محدودة بحجم الدفعة لا بحجم الملفات.
+    عند تكرار الرسالة تُحفظ نسختها من أحدث ملف (آخر تعديل).
+    """
+
+    def __init__(self, serializer=None, run_size=100000):
+        self.serializer = serializer or get_serializer()
+        self.run_size = max(1, run_size)
+
+    def spill(self, run_dir, runs, version, buffer):
+        """كتابة دفعة مرتبة بالمعرف (والأحدث أولاً عند التساوي) إلى ملف مؤقت"""
+        buffer.sort(key=lambda record: record.id)
+        path = os.path.join(run_dir, f'run_{len(runs)}.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in buffer:
+                f.write(self.serializer.dumps([version] + record.to_row()))
+                f.write('\n')
+        runs.append(path)
+        buffer.clear()
+
+    def read_run(self, path, index):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                item = self.serializer.loads(line)
+                # مفتاح الدمج: المعرف تصاعدياً ثم الإصدار تنازلياً؛ رقم الدفعة يمنع مقارنة الصفوف نفسها
+                yield item[1], -item[0], index, item[1:]
+
+    def compact(self, files, output_file):
+        """files مرتبة من الأقدم للأحدث؛ يعيد (المحادثة، عدد الصفوف المقروءة، عدد الصفوف المكتوبة)"""
+        import heapq
+        import tempfile
+        
+        chat = None
+        rows_read = 0
+        runs = []
+        run_dir = tempfile.mkdtemp(prefix='.compact_', dir=os.path.dirname(output_file) or '.')
+        try:
+            for version, path in enumerate(files):
+                buffer = []
+                for file_chat, record in iter_export(path, self.serializer):
+                    chat = file_chat or chat
+                    buffer.append(record)
+                    rows_read += 1
+                    if len(buffer) >= self.run_size:
+                        self.spill(run_dir, runs, version, buffer)
+                if buffer:
+                    self.spill(run_dir, runs, version, buffer)
+            
+            rows_written = 0
+            if not runs:
+                return chat, rows_read, rows_written
+            tmp_file = output_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8', buffering=65536) as f:
+                f.write(self.serializer.dumps(MessageRecord.header(chat['id'], chat['title'])) + '\n')
+                last_id = None
+                merged = heapq.merge(*(self.read_run(path, index) for index, path in enumerate(runs)))
+                for message_id, _, _, row in merged:
+                    if message_id == last_id:
+                        continue
+                    last_id = message_id
+                    f.write(self.serializer.dumps(row) + '\n')
+                    rows_written += 1
+            os.replace(tmp_file, output_file)
+        finally:
+            for path in runs:
+                os.remove(path)
+            os.rmdir(run_dir)
+        return chat, rows_read, rows_written
+
+def load_numpy(backend='auto'):
+    """NumPy اختياري لتجميع الإحصاءات بعمليات متجهة"""
+    if backend == 'python':
+        return None
+    try:
+        import numpy
+    except ImportError:
+        if backend == 'numpy':
+            raise
+        return None
+    return numpy
+
+class StatsEngine:
+    """إحصاءات تدفقية لمحادثة: النشاط اليومي، أكثر المرسلين، نسبة الوسائط، توزيع أطوال النصوص
+
+    مع NumPy تُجمع الرسائل في دفعات أعمدة وتُلخص كل دفعة بعمليات متجهة، وبدونه
+    تُحدَّث العدادات لكل رسالة. الذاكرة محدودة بعدد الأيام والمرسلين المختلفين
+    لا بعدد الرسائل؛ أطوال النصوص في مدرج ثابت (حد رسالة تليجرام 4096 حرفاً).
+    """
+
+    MAX_TEXT = 4096
+    CHUNK_SIZE = 65536
+    LENGTH_BUCKETS = ((0, 0), (1, 10), (11, 50), (51, 100), (101, 500), (501, 1000), (1001, 4096))
+
+    def __init__(self, numpy=None):
+        self.np = numpy
+        self.count = 0
+        self.media = 0
+        self.first_date = None
+        self.last_date = None
+        self.days = {}
+        self.senders = {}
+        if numpy is not None:
+            self.lengths = numpy.zeros(self.MAX_TEXT + 1, dtype=numpy.int64)
+        else:
+            self.lengths = [0] * (self.MAX_TEXT + 1)
+        self._dates = []
+        self._senders = []
+        self._lengths = []
+
+    def add(self, date, sender_id, text_length, has_media):
+        """date بثواني Unix (أو None)، sender_id قد يكون None لمنشورات القنوات"""
+        self.count += 1
+        if has_media:
+            self.media += 1
+        if self.np is not None:
+            self._dates.append(date or 0)
+            self._senders.append(sender_id or 0)
+            self._lengths.append(text_length)
+            if len(self._dates) >= self.CHUNK_SIZE:
+                self.flush()
+            return
+        
+        if date:
+            day = date // 86400
+            self.days[day] = self.days.get(day, 0) + 1
+            if self.first_date is None or date < self.first_date:
+                self.first_date = date
+            if self.last_date is None or date > self.last_date:
+                self.last_date = date
+        sender_id = sender_id or 0
+        self.senders[sender_id] = self.senders.get(sender_id, 0) + 1
+        self.lengths[min(text_length, self.MAX_TEXT)] += 1
+
+    def add_record(self, record):
+        self.add(record.date, record.sender_id, len(record.text), record.has_media)
+
+    def add_rows(self, rows):
+        """دفعة صفوف مضغوطة [id, date, sender_id, text, has_media]"""
+        if self.np is None:
+            for row in rows:
+                self.add(row[1], row[2], len(row[3]), row[4])
+            return
+        _, dates, senders, texts, media = zip(*rows)
+        self.count += len(rows)
+        self.media += sum(map(bool, media))
+        self.summarize([date or 0 for date in dates], [sender or 0 for sender in senders], list(map(len, texts)))
+
+    def merge_counts(self, target, keys, counts):
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            target[key] = target.get(key, 0) + count
+
+    def flush(self):
+        """تلخيص الدفعة الحالية بعمليات NumPy ثم تفريغها"""
+        if self.np is None or not self._dates:
+            return
+        self.summarize(self._dates, self._senders, self._lengths)
+        self._dates, self._senders, self._lengths = [], [], []
+
+    def summarize(self, dates, senders, lengths):
+        np = self.np
+        dates = np.array(dates, dtype=np.int64)
+        dates = dates[dates > 0]
+        if dates.size:
+            self.merge_counts(self.days, *np.unique(dates // 86400, return_counts=True))
+            first, last = int(dates.min()), int(dates.max())
+            self.first_date = first if self.first_date is None else min(self.first_date, first)
+            self.last_date = last if self.last_date is None else max(self.last_date, last)
+        self.merge_counts(self.senders, *np.unique(np.array(senders, dtype=np.int64), return_counts=True))
+        lengths = np.minimum(np.array(lengths, dtype=np.int64), self.MAX_TEXT)
+        self.lengths += np.bincount(lengths, minlength=self.MAX_TEXT + 1)
+
+    def percentile(self, lengths, fraction):
+        target = fraction * self.count
+        running = 0
+        for length, count in enumerate(lengths):
+            running += count
+            if running >= target and count:
+                return length
+        return 0
+
+    def to_dict(self, top=10):
+        self.flush()
+        lengths = [int(count) for count in self.lengths]
+        as_date = lambda seconds: datetime.fromtimestamp(seconds, timezone.utc).isoformat() if seconds else None
+        per_day = {
+            datetime.fromtimestamp(day * 86400, timezone.utc).strftime('%Y-%m-%d'): count
+            for day, count in sorted(self.days.items())
+        }
+        # الترتيب بالعدد ثم بالمفتاح حتى تتطابق نتيجة المسارين عند التساوي
+        top_senders = sorted(self.senders.items(), key=lambda item: (-item[1], item[0]))[:top]
+        
+        buckets = {
+            f'{low}-{high}' if high else '0': sum(lengths[low:high + 1])
+            for low, high in self.LENGTH_BUCKETS
+        }
+        
+        return {
+            'messages': self.count,
+            'first_date': as_date(self.first_date),
+            'last_date': as_date(self.last_date),
+            'active_days': len(self.days),
+            'busiest_days': sorted(per_day.items(), key=lambda item: (-item[1], item[0]))[:top],
+            'distinct_senders': len(self.senders),
+            'top_senders': [[sender_id or None, count] for sender_id, count in top_senders],
+            'media_ratio': round(self.media / self.count, 4) if self.count else 0,
+            'text_length': {
+                'mean': round(sum(length * count for length, count in enumerate(lengths)) / self.count, 1)
+                if self.count else 0,
+                'p50': self.percentile(lengths, 0.5),
+                'p90': self.percentile(lengths, 0.9),
+                'p99': self.percentile(lengths, 0.99),
+                'buckets': buckets
+            },
+            'per_day': per_day
+        }
+
+class StreamingExportWriter:
+    """كتابة الرسائل فور وصولها بصيغة JSONL مع ملف نصي من نفس التدفق
+
+    في الصيغة المضغوطة يبدأ الملف بسطر رأس للمحادثة ثم صف لكل رسالة؛
+    في الصيغة القديمة (compact=False) قاموس كامل لكل رسالة.
+    """
+
+    def __init__(self, jsonl_file, txt_file, chat_id, chat_title, flush_every=500, buffer_size=65536,
+                 on_flush=None, serializer=None, compact=True, names=None):
+        self.jsonl_file = jsonl_file
+        self.txt_file = txt_file
+        self.chat_id = chat_id
+        self.chat_title = chat_title
+        self.flush_every = max(1, flush_every)
+        self.on_flush = on_flush
+        self.serializer = serializer or get_serializer()
+        self.compact = compact
+        self.names = names
+        self.count = 0
+        self._jsonl = open(jsonl_file, 'w', encoding='utf-8', buffering=buffer_size)
+        self._txt = open(txt_file, 'w', encoding='utf-8', buffering=buffer_size)
+        if compact:
+            self._jsonl.write(self.serializer.dumps(MessageRecord.header(chat_id, chat_title)))
+            self._jsonl.write('\n')
+        self._txt.write(f"رسائل مجموعة: {chat_title}\n")
+        self._txt.write("="*50 + "\n\n")
+
+    def write(self, record):
+        """كتابة رسالة واحدة إلى الملفين"""
+        if self.compact:
+            self._jsonl.write(self.serializer.dumps(record.to_row()))
+        else:
+            self._jsonl.write(self.serializer.dumps(record.to_dict(self.chat_id, self.chat_title)))
+        self._jsonl.write('\n')
+        self._txt.write(render_txt_message(record, self.names))
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.flush()
+
+    def flush(self):
+        """دفع المخزن المؤقت إلى القرص"""
+        with metrics.timer('export.flush'):
+            self._jsonl.flush()
+            self._txt.flush()
+        if self.on_flush:
+            self.on_flush()
+
+    def close(self):
+        """إغلاق الملفين مع تسجيل عدد الرسائل في نهاية الملف النصي"""
+        if self._jsonl.closed:
+            return
+        self._txt.write(f"\nعدد الرسائل: {self.count}\n")
+        self._jsonl.close()
+        self._txt.close()
+        metrics.add_file('jsonl', self.jsonl_file)
+        metrics.add_file('txt', self.txt_file)
+        if self.on_flush:
+            self.on_flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class TailWriter:
+    """إلحاق أحداث المتابعة الحية بملف JSONL لكل محادثة؛ نفس واجهة MessageArchive"""
+
+    def __init__(self, exports_dir, serializer=None):
+        self.exports_dir = exports_dir
+        self.serializer = serializer or get_serializer()
+        self.count = 0
+        self.titles = {}
+        self._files = {}
+
+    def file_for(self, chat_id):
+        if chat_id not in self._files:
+            path = os.path.join(self.exports_dir, f'tail_{chat_id}.jsonl')
+            self._files[chat_id] = open(path, 'a', encoding='utf-8')
+        return self._files[chat_id]
+
+    def append(self, chat_id, record):
+        f = self.file_for(chat_id)
+        line = self.serializer.dumps(record) + '\n'
+        f.write(line)
+        if metrics.enabled:
+            metrics.add_bytes('tail', len(line.encode('utf-8')))
+        # الأحداث قليلة ومتباعدة: كل سطر يصل القرص فوراً
+        f.flush()
+
+    def add(self, chat_id, record, edit_date=None):
+        # سجل أحداث: كل سطر مستقل بالشكل الكامل مع نوع الحدث
+        msg_data = record.to_dict(chat_id, self.titles.get(chat_id))
+        msg_data['event'] = 'edited' if edit_date else 'new'
+        if edit_date:
+            msg_data['edit_date'] = edit_date
+        self.append(chat_id, msg_data)
+        self.count += 1
+
+    def mark_deleted(self, chat_id, message_ids):
+        self.append(chat_id, {
+            'event': 'deleted',
+            'group_id': chat_id,
+            'ids': list(message_ids),
+            'date': datetime.now().isoformat()
+        })
+
+    def upsert_chat(self, chat_id, title):
+        self.titles[chat_id] = title
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+
+class MessageArchive:
+    """مخزن أرشيف SQLite مع فهرس FTS5 للبحث النصي"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS chats (
+            chat_id INTEGER PRIMARY KEY,
+            title TEXT,
+            updated_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS messages (
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            date TEXT,
+            sender_id INTEGER,
+            text TEXT,
+            has_media INTEGER,
+            edit_date TEXT,
+            deleted INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (chat_id, message_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_date ON messages (date);
+        CREATE INDEX IF NOT EXISTS idx_messages_sender ON messages (sender_id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+            text, content='messages', content_rowid='rowid'
+        );
+        CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF text ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            INSERT INTO messages_fts (rowid, text) VALUES (new.rowid, new.text);
+        END;
+    """
+
+    # أعمدة أضيفت بعد الإصدار الأول؛ تُضاف لقواعد البيانات القديمة عند الفتح
+    MIGRATIONS = {
+        'edit_date': 'TEXT',
+        'deleted': 'INTEGER NOT NULL DEFAULT 0'
+    }
+
+    UPSERT = """
+        INSERT INTO messages (chat_id, message_id, date, sender_id, text, has_media, edit_date)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (chat_id, message_id) DO UPDATE SET
+            date = excluded.date,
+            sender_id = excluded.sender_id,
+            text = excluded.text,
+            has_media = excluded.has_media,
+            edit_date = COALESCE(excluded.edit_date, messages.edit_date)
+    """
+
+    def __init__(self, db_file, batch_size=500, on_commit=None):
+        self.db_file = db_file
+        self.batch_size = max(1, batch_size)
+        self.on_commit = on_commit
+        self.count = 0
+        self._pending = []
+        self._initial_size = os.path.getsize(db_file) if os.path.exists(db_file) else 0
+        # الاتصال يُستخدم من خيط الكاتب الخلفي؛ كاتب واحد فقط في كل لحظة
+        self.conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(self.SCHEMA)
+        self.migrate()
+
+    def migrate(self):
+        """إضافة الأعمدة الناقصة في أرشيف أنشأه إصدار أقدم"""
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(messages)')}
+        with self.conn:
+            for column, definition in self.MIGRATIONS.items():
+                if column not in columns:
+                    self.conn.execute(f'ALTER TABLE messages ADD COLUMN {column} {definition}')
+
+    def upsert_chat(self, chat_id, title):
+        """تسجيل المحادثة أو تحديث اسمها"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO chats (chat_id, title, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (chat_id) DO UPDATE SET title = excluded.title, updated_at = excluded.updated_at",
+                (chat_id, title, datetime.now().isoformat())
+            )
+
+    def add(self, chat_id, record, edit_date=None):
+        """إضافة رسالة إلى الدفعة الحالية؛ تُكتب الدفعة داخل معاملة واحدة عند امتلائها"""
+        self._pending.append((
+            chat_id, record.id, record.iso_date, record.sender_id, record.text,
+            1 if record.has_media else 0, edit_date
+        ))
+        self.count += 1
+        if len(self._pending) >= self.batch_size:
+            self.commit()
+
+    def commit(self):
+        """كتابة الدفعة المعلقة"""
+        if self._pending:
+            with metrics.timer('sqlite.commit'), self.conn:
+                self.conn.executemany(self.UPSERT, self._pending)
+            self._pending = []
+        if self.on_commit:
+            self.on_commit()
+
+    def mark_deleted(self, chat_id, message_ids):
+        """تعليم رسائل حذفت من تليجرام دون إزالتها من الأرشيف"""
+        self.commit()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE messages SET deleted = 1 WHERE chat_id = ? AND message_id = ?",
+                [(chat_id, message_id) for message_id in message_ids]
+            )
+
+    def search(self, query, chat_id=None, since=None, until=None, sender_id=None, limit=50):
+        """بحث نصي كامل مع تصفية اختيارية بالمحادثة والتاريخ والمرسل"""
+        sql = (
+            "SELECT m.chat_id, c.title, m.message_id, m.date, m.sender_id, m.text "
+            "FROM messages_fts f "
+            "JOIN messages m ON m.rowid = f.rowid "
+            "LEFT JOIN chats c ON c.chat_id = m.chat_id "
+            "WHERE messages_fts MATCH ?"
+        )
+        params = [query]
+        if chat_id is not None:
+            sql += " AND m.chat_id = ?"
+            params.append(chat_id)
+        if since:
+            sql += " AND m.date >= ?"
+            params.append(since)
+        if until:
+            sql += " AND m.date < ?"
+            params.append(until)
+        if sender_id is not None:
+            sql += " AND m.sender_id = ?"
+            params.append(sender_id)
+        sql += " ORDER BY m.date DESC LIMIT ?"
+        params.append(limit)
+        return self.conn.execute(sql, params).fetchall()
+
+    def close(self):
+        if self.conn is None:
+            return
+        self.commit()
+        self.conn.close()
+        self.conn = None
+        if metrics.enabled:
+            # نمو الملف بعد دمج WAL عند الإغلاق (التحديثات في مكانها لا تُحتسب)
+            metrics.add_bytes('sqlite', max(0, os.path.getsize(self.db_file) - self._initial_size))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class EntityCache:
+    """ذاكرة دائمة لحل الروابط والمعرفات إلى كيانات تليجرام (معرف + access_hash + الاسم)"""
+
+    def __init__(self, cache_file, ttl=86400, serializer=None):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.serializer = serializer or get_serializer()
+        self.hits = 0
+        self.misses = 0
+        self._served = set()
+        self.entries = {}
+        if os.path.exists(cache_file):
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                self.entries = self.serializer.load(f)
+
+    @staticmethod
+    def normalize(link):
+        """توحيد صيغ الرابط: https://t.me/name و t.me/name و @name"""
+        key = link.strip()
+        for prefix in ('https://', 'http://'):
+            if key.startswith(prefix):
+                key = key[len(prefix):]
+        for prefix in ('t.me/', 'telegram.me/', '@'):
+            if key.startswith(prefix):
+                key = key[len(prefix):]
+        key = key.rstrip('/')
+        # أسماء المستخدمين لا تتأثر بحالة الأحرف، بعكس روابط الدعوة
+        if not key.startswith(('+', 'joinchat/')):
+            key = key.lower()
+        return key
+
+    def get(self, link):
+        """إرجاع الكيان المخزن إن وجد ولم تنته صلاحيته"""
+        key = self.normalize(link)
+        record = self.entries.get(key)
+        if record and time.time() - record['cached_at'] < self.ttl:
+            entity = self.build_entity(record)
+            if entity is not None:
+                self.hits += 1
+                self._served.add(key)
+                return entity
+        self.misses += 1
+        return None
+
+    def put(self, link, entity):
+        """تخزين كيان محلول وحفظ الملف"""
+        record = self.entity_to_record(entity)
+        if record is None:
+            return
+        self.entries[self.normalize(link)] = record
+        self.save()
+
+    def invalidate(self, link):
+        """حذف كيان قديم؛ يرجع True إذا كان الكيان قد قُدِّم من الذاكرة في هذه الجلسة"""
+        key = self.normalize(link)
+        served = key in self._served
+        self._served.discard(key)
+        if self.entries.pop(key, None) is not None:
+            self.save()
+        return served
+
+    def save(self):
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            self.serializer.dump(self.entries, f)
+        os.replace(tmp_file, self.cache_file)
+
+    @staticmethod
+    def entity_to_record(entity):
+        from telethon.tl.types import Channel, Chat, User
+        record = {'peer_id': entity.id, 'cached_at': time.time()}
+        if isinstance(entity, Channel):
+            record.update(type='Channel', access_hash=entity.access_hash, title=entity.title, username=entity.username,
+                          megagroup=bool(entity.megagroup), broadcast=bool(entity.broadcast))
+        elif isinstance(entity, Chat):
+            record.update(type='Chat', title=entity.title)
+        elif isinstance(entity, User):
+            record.update(type='User', access_hash=entity.access_hash, title=entity.first_name, username=entity.username)
+        else:
+            return None
+        return record
+
+    @staticmethod
+    def build_entity(record):
+        """إعادة بناء كيان Telethon يكفي للطلبات دون الاتصال بالخادم"""
+        from telethon.tl.types import Channel, Chat, User, ChatPhotoEmpty
+        if record['type'] == 'Channel':
+            return Channel(id=record['peer_id'], title=record['title'], photo=ChatPhotoEmpty(), date=None,
+                           access_hash=record['access_hash'], username=record.get('username'),
+                           megagroup=record.get('megagroup'), broadcast=record.get('broadcast'))
+        if record['type'] == 'Chat':
+            return Chat(id=record['peer_id'], title=record['title'], photo=ChatPhotoEmpty(),
+                        participants_count=0, date=None, version=0)
+        if record['type'] == 'User':
+            return User(id=record['peer_id'], access_hash=record['access_hash'],
+                        first_name=record.get('title'), username=record.get('username'))
+        return None
+
+class SenderDirectory:
+    """أسماء المرسلين بحسب المعرف للملفات النصية والتقارير
+
+    تُملأ من الكيانات التي يعيدها تليجرام مع كل صفحة من السجل (message.sender) دون أي
+    طلب إضافي، وتُحفظ كخريطة مختصرة {المعرف: الاسم}. كل مرسل يُفحص مرة واحدة في التشغيل
+    فيتحدث اسمه إذا تغير، وما بقي بلا كيان يُحل في دفعة واحدة بعد التصدير.
+    """
+
+    def __init__(self, directory_file, serializer=None):
+        self.directory_file = directory_file
+        self.serializer = serializer or get_serializer()
+        self.names = {}
+        self.unknown = set()
+        self._seen = set()
+        self._dirty = False
+        if os.path.exists(directory_file):
+            with open(directory_file, 'r', encoding='utf-8') as f:
+                self.names = {int(sender_id): name for sender_id, name in self.serializer.load(f).items()}
+
+    def observe(self, message):
+        """تسجيل اسم مرسل الرسالة من الكيان المرفق بها إن وجد"""
+        sender_id = message.sender_id
+        if sender_id is None or sender_id in self._seen:
+            return
+        self._seen.add(sender_id)
+        sender = message.sender
+        if sender is not None:
+            from telethon import utils
+            self.set(sender_id, utils.get_display_name(sender))
+        elif sender_id not in self.names:
+            self.unknown.add(sender_id)
+
+    def set(self, sender_id, name):
+        self.unknown.discard(sender_id)
+        # الحسابات المحذوفة بلا اسم: يبقى المعرف
+        if name and self.names.get(sender_id) != name:
+            self.names[sender_id] = name
+            self._dirty = True
+
+    def display(self, sender_id):
+        return self.names.get(sender_id) or f'User_{sender_id}'
+
+    async def resolve_unknown(self, client, scheduler=None):
+        """حل المعرفات المجهولة بطلب مجمّع واحد (يقسمه Telethon إلى 200 مستخدم لكل طلب)
+
+        يُستخدم فقط ما له access_hash في ذاكرة الجلسة؛ طلب منفصل لكل معرف مجهول هو
+        بالضبط ما تتجنبه هذه الخريطة. يرجع عدد الأسماء المحلولة.
+        """
+        ids, self.unknown = self.unknown, set()
+        peers = []
+        for sender_id in ids:
+            try:
+                peers.append(client.session.get_input_entity(sender_id))
+            except ValueError:
+                continue
+        if not peers:
+            return 0
+
+        scheduler = scheduler or FloodWaitScheduler()
+        from telethon import utils
+        with metrics.timer('get_entity.batch'):
+            entities = await scheduler.call(client.get_entity, peers)
+        for entity in entities:
+            self.set(utils.get_peer_id(entity), utils.get_display_name(entity))
+        return len(entities)
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_file = self.directory_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            # مفاتيح JSON نصوص دائماً (orjson يرفض المفاتيح الرقمية)
+            self.serializer.dump({str(sender_id): name for sender_id, name in self.names.items()}, f)
+        os.replace(tmp_file, self.directory_file)
+        self._dirty = False
+
+class BackgroundWriter:
+    """مرحلة كتابة خارج حلقة asyncio: طابور محدود يفرغه خيط كتابة مخصص"""
+
+    COMMIT = 'commit'
+
+    def __init__(self, write, flush, maxsize=1000, batch_size=200, on_commit=None):
+        self.write = write
+        self.flush = flush
+        self.on_commit = on_commit
+        self.batch_size = max(1, batch_size)
+        self.queue = asyncio.Queue(max(1, maxsize))
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export-writer')
+        self.max_depth = 0
+        self.depth_total = 0
+        self.puts = 0
+        self.producer_blocked = 0.0
+        self.writer_idle = 0.0
+        self.writer_busy = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.ensure_future(self.drain())
+
+    async def put(self, item):
+        """إضافة عنصر؛ ينتظر الجالب إذا امتلأ الطابور (ضغط عكسي)"""
+        if self._task.done():
+            self._task.result()
+        if self.queue.full():
+            started = time.monotonic()
+            put_task = asyncio.ensure_future(self.queue.put(item))
+            await asyncio.wait({put_task, self._task}, return_when=asyncio.FIRST_COMPLETED)
+            self.producer_blocked += time.monotonic() - started
+            if not put_task.done():
+                put_task.cancel()
+                self._task.result()
+        else:
+            self.queue.put_nowait(item)
+        depth = self.queue.qsize()
+        self.puts += 1
+        self.depth_total += depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    async def commit(self, snapshot):
+        """علامة حفظ: تُنفَّذ بعد كتابة كل ما سبقها في الطابور"""
+        await self.put((self.COMMIT, snapshot))
+
+    async def drain(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = time.monotonic()
+            batch = [await self.queue.get()]
+            self.writer_idle += time.monotonic() - started
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            
+            started = time.monotonic()
+            finished = await loop.run_in_executor(self.executor, self.write_batch, batch)
+            elapsed = time.monotonic() - started
+            self.writer_busy += elapsed
+            if metrics.enabled:
+                metrics.observe('writer.batch', elapsed)
+            if finished:
+                return
+
+    def write_batch(self, batch):
+        """يعمل داخل خيط الكاتب: التحويل إلى JSON والكتابة على القرص"""
+        for item in batch:
+            if item is None:
+                return True
+            if isinstance(item, tuple):
+                self.flush()
+                if self.on_commit:
+                    self.on_commit(item[1])
+                continue
+            self.write(item)
+        return False
+
+    async def close(self):
+        """انتظار تفريغ الطابور بالكامل"""
+        try:
+            await self.put(None)
+            await self._task
+        finally:
+            self.executor.shutdown(wait=True)
+
+    async def abort(self):
+        """إيقاف الكاتب دون انتظار العناصر المتبقية"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.executor.shutdown(wait=True)
+
+    def to_dict(self):
+        return {
+            'max_queue_depth': self.max_depth,
+            'avg_queue_depth': round(self.depth_total / self.puts, 1) if self.puts else 0,
+            'producer_blocked_seconds': round(self.producer_blocked, 3),
+            'writer_idle_seconds': round(self.writer_idle, 3),
+            'writer_busy_seconds': round(self.writer_busy, 3)
+        }
+
+class MediaDownloader:
+    """تحميل مرفقات الرسائل في الخلفية بعدد عمال محدود وتخزين بحسب المحتوى (sha256)
+
+    الرسائل تُسجَّل بـ submit دون انتظار، فيستمر تدفق البيانات الوصفية بينما يلحق
+    التحميل به. نفس الملف المعاد توجيهه يُحمَّل مرة واحدة في كل المحادثات، والتحميل
+    المنقطع يُستأنف من ملف ‎.part عند التشغيل التالي.
+    """
+
+    # حجم طلب upload.getFile؛ الاستئناف يبدأ من مضاعف له حتى لا يعبر حدود 1MB
+    CHUNK_SIZE = 512 * 1024
+
+    def __init__(self, client, media_dir, concurrency=3, max_bytes=None, serializer=None, emit=None, progress=None):
+        self.client = client
+        self.media_dir = media_dir
+        self.partial_dir = os.path.join(media_dir, 'partial')
+        self.index_file = os.path.join(media_dir, 'index.json')
+        self.manifest_file = os.path.join(media_dir, 'manifest.jsonl')
+        self.concurrency = max(1, concurrency)
+        self.max_bytes = max_bytes
+        self.serializer = serializer or get_serializer()
+        self.emit = emit
+        self.progress = progress
+        self.scheduler = FloodWaitScheduler(self.concurrency)
+        self.queue = asyncio.Queue()
+        self.workers = []
+        self.index = {}
+        self.queued = set()
+        self.pending = 0
+        self.manifest = None
+        self.downloaded = 0
+        self.deduplicated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+
+    @classmethod
+    def describe(cls, media):
+        """(مفتاح ثابت للملف، الحجم، الامتداد)، أو None لوسائط بلا ملف (روابط، مواقع، استطلاعات)"""
+        from telethon import utils
+        from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto
+        if isinstance(media, MessageMediaDocument) and media.document:
+            document = media.document
+            return f'document_{document.id}', document.size, utils.get_extension(document)
+        if isinstance(media, MessageMediaPhoto) and media.photo and getattr(media.photo, 'sizes', None):
+            # نفس المقاس الذي يحمّله Telethon: الأكبر في نهاية القائمة
+            largest = media.photo.sizes[-1]
+            size = getattr(largest, 'size', None) or max(getattr(largest, 'sizes', None) or [0])
+            return f'photo_{media.photo.id}', size, '.jpg'
+        return None
+
+    def start(self):
+        os.makedirs(self.partial_dir, exist_ok=True)
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                self.index = self.serializer.load(f)
+        self.manifest = open(self.manifest_file, 'a', encoding='utf-8')
+        self.workers = [asyncio.create_task(self.work()) for _ in range(self.concurrency)]
+
+    def submit(self, chat_id, message):
+        """تسجيل مرفق رسالة للتحميل؛ لا ينتظر أبداً"""
+        if not message.media:
+            return
+        info = self.describe(message.media)
+        if info is None:
+            return
+        key, size, ext = info
+        if self.max_bytes and size and size > self.max_bytes:
+            self.skipped += 1
+            return
+        
+        # ربط الرسالة بالملف يُسجل فوراً؛ المسار الفعلي في index.json بعد التحميل
+        self.manifest.write(self.serializer.dumps({'chat_id': chat_id, 'message_id': message.id, 'media': key}) + '\n')
+        if key in self.index or key in self.queued:
+            self.deduplicated += 1
+            return
+        self.queued.add(key)
+        self.pending += 1
+        self.queue.put_nowait((key, size, ext, message.media))
+
+    async def work(self):
+        from telethon.errors import FloodWaitError
+        while True:
+            key, size, ext, media = await self.queue.get()
+            try:
+                while True:
+                    await self.scheduler.wait_ready()
+                    try:
+                        with metrics.timer('download'):
+                            await self.download(key, size, ext, media)
+                        break
+                    except FloodWaitError as e:
+                        # ما تم تحميله محفوظ في ‎.part والمحاولة التالية تكمل منه
+                        self.scheduler.penalize(e.seconds, 'download')
+            except Exception as e:
+                self.failed += 1
+                if self.emit:
+                    self.emit('warning', f'فشل تحميل {key}: {str(e)}')
+            finally:
+                self.pending -= 1
+                self.queue.task_done()
+
+    async def download(self, key, size, ext, media):
+        """تحميل ملف واحد مع الاستئناف، ثم نقله إلى مساره بحسب بصمة المحتوى"""
+        import hashlib
+        part_file = os.path.join(self.partial_dir, key + '.part')
+        digest = hashlib.sha256()
+        offset = 0
+        if os.path.exists(part_file):
+            offset = os.path.getsize(part_file) // self.CHUNK_SIZE * self.CHUNK_SIZE
+            with open(part_file, 'r+b') as f:
+                f.truncate(offset)
+                for block in iter(lambda: f.read(self.CHUNK_SIZE), b''):
+                    digest.update(block)
+        
+        with open(part_file, 'ab') as f:
+            try:
+                async for chunk in self.client.iter_download(media, offset=offset, request_size=self.CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    self.bytes += len(chunk)
+            finally:
+                metrics.add_bytes('media', f.tell() - offset)
+        
+        sha256 = digest.hexdigest()
+        relative = os.path.join(sha256[:2], sha256 + (ext or ''))
+        target = os.path.join(self.media_dir, relative)
+        if os.path.exists(target):
+            # نفس المحتوى وصل بمعرف مختلف (مثلاً رفع جديد لنفس الملف)
+            os.remove(part_file)
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(part_file, target)
+            self.downloaded += 1
+        self.index[key] = {'sha256': sha256, 'size': os.path.getsize(target), 'file': relative}
+        if self.progress:
+            self.progress.update()
+
+    def save_index(self):
+        tmp_file = self.index_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            self.serializer.dump(self.index, f)
+        os.replace(tmp_file, self.index_file)
+
+    async def close(self):
+        """انتظار انتهاء كل التحميلات المعلقة ثم حفظ الفهرس"""
+        try:
+            await self.queue.join()
+        finally:
+            await self.abort()
+
+    async def abort(self):
+        """إيقاف العمال فوراً؛ الملفات الجزئية تبقى للاستئناف لاحقاً"""
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        if self.manifest:
+            self.manifest.close()
+            self.manifest = None
+            self.save_index()
+
+    def to_dict(self):
+        return {
+            'downloaded': self.downloaded,
+            'deduplicated': self.deduplicated,
+            'skipped_too_large': self.skipped,
+            'failed': self.failed,
+            'pending': self.pending,
+            'bytes': self.bytes,
+            'flood_wait_seconds': self.scheduler.flood_wait_seconds
+        }
+
+class ExportCheckpoint:
+    """نقطة استئناف التصدير: أعلى وأدنى معرّف رسالة تم تصديره لمجموعة"""
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.max_id = data.get('max_id', 0)
+        self.min_id = data.get('min_id', 0)
+        self.backfill_done = data.get('backfill_done', False)
+
+    def observe(self, message_id):
+        """تحديث الحدود برسالة تم تصديرها"""
+        if message_id > self.max_id:
+            self.max_id = message_id
+        if not self.min_id or message_id < self.min_id:
+            self.min_id = message_id
+
+    def to_dict(self):
+        return {
+            'max_id': self.max_id,
+            'min_id': self.min_id,
+            'backfill_done': self.backfill_done,
+            'updated_at': datetime.now().isoformat()
+        }
+
+class ExportFilters:
+    """فلاتر التصدير: ما يدعمه تليجرام يُرسل مع الطلب، والباقي يُطبَّق على التدفق قبل التحويل"""
+
+    # أنواع الوسائط التي يصفيها الخادم (أسماء أصناف InputMessagesFilter في Telethon)
+    SERVER_MEDIA = {
+        'photo': 'InputMessagesFilterPhotos',
+        'video': 'InputMessagesFilterVideo',
+        'photo_video': 'InputMessagesFilterPhotoVideo',
+        'document': 'InputMessagesFilterDocument',
+        'voice': 'InputMessagesFilterVoice',
+        'music': 'InputMessagesFilterMusic',
+        'gif': 'InputMessagesFilterGif',
+        'round': 'InputMessagesFilterRoundVideo',
+        'url': 'InputMessagesFilterUrl'
+    }
+    # أنواع لا مقابل لها في الخادم وتُفحص محلياً
+    STREAM_MEDIA = ('any', 'none')
+    MEDIA_TYPES = tuple(SERVER_MEDIA) + STREAM_MEDIA
+
+    def __init__(self, since=None, until=None, sender=None, search=None, media=None, oldest_first=False):
+        if media and media not in self.MEDIA_TYPES:
+            raise ValueError(f'نوع وسائط غير معروف: {media}')
+        self.since = self.parse_date(since)
+        self.until = self.parse_date(until)
+        if isinstance(sender, str) and sender.lstrip('-').isdigit():
+            sender = int(sender)
+        self.sender = sender
+        self.search = search or None
+        self.media = media or None
+        self.oldest_first = oldest_first
+
+    @staticmethod
+    def parse_date(value):
+        """YYYY-MM-DD أو تاريخ ISO كامل؛ التواريخ بدون منطقة زمنية تعتبر UTC"""
+        if not value:
+            return None
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+    def __bool__(self):
+        return any((self.since, self.until, self.sender is not None, self.search, self.media, self.oldest_first))
+
+    @property
+    def stream_only(self):
+        """هل يوجد فلتر يسقط رسائل محلياً (فلا يمكن تمرير الحد للخادم كما هو)"""
+        return self.media in self.STREAM_MEDIA
+
+    def to_kwargs(self):
+        """معاملات iter_messages المقابلة"""
+        kwargs = {}
+        if self.oldest_first:
+            kwargs['reverse'] = True
+            if self.since:
+                kwargs['offset_date'] = self.since
+        elif self.until:
+            kwargs['offset_date'] = self.until
+        if self.sender is not None:
+            kwargs['from_user'] = self.sender
+        if self.search:
+            kwargs['search'] = self.search
+        if self.media in self.SERVER_MEDIA:
+            from telethon.tl import types
+            kwargs['filter'] = getattr(types, self.SERVER_MEDIA[self.media])
+        return kwargs
+
+    def past_range(self, message):
+        """الرسائل مرتبة بالتاريخ: أول رسالة خارج النطاق تنهي الجلب"""
+        if not message.date:
+            return False
+        if self.oldest_first:
+            return self.until is not None and message.date >= self.until
+        return self.since is not None and message.date < self.since
+
+    def accept(self, message):
+        """الفلاتر التي لا يدعمها الخادم"""
+        if self.media == 'any':
+            return bool(message.media)
+        if self.media == 'none':
+            return not message.media
+        return True
+
+    def to_dict(self):
+        return {
+            'since': self.since.isoformat() if self.since else None,
+            'until': self.until.isoformat() if self.until else None,
+            'sender': self.sender,
+            'search': self.search,
+            'media': self.media,
+            'oldest_first': self.oldest_first
+        }
+
+class FloodWaitScheduler:
+    """جدولة مشتركة بين المهام المتزامنة تحترم FloodWaitError للجميع"""
+
+    def __init__(self, concurrency=4):
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.flood_wait_seconds = 0
+        self._resume_at = 0.0
+
+    def penalize(self, seconds, source='request'):
+        """تسجيل مهلة انتظار يفرضها تليجرام على كل المهام"""
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+        self.flood_wait_seconds += seconds
+        metrics.flood_wait(source, seconds)
+
+    async def wait_ready(self):
+        """الانتظار حتى تنتهي أي مهلة قائمة"""
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def call(self, func, *args, **kwargs):
+        """تنفيذ طلب مع إعادة المحاولة بعد انتهاء مهلة FloodWait"""
+        from telethon.errors import FloodWaitError
+        while True:
+            await self.wait_ready()
+            try:
+                return await func(*args, **kwargs)
+            except FloodWaitError as e:
+                self.penalize(e.seconds, getattr(func, '__name__', 'request'))
+
+class ExportStats:
+    """إحصاءات الطلبات والانتظار لعملية تصدير"""
+
+    def __init__(self, mode='plain'):
+        self.mode = mode
+        self.requests = 0
+        self.messages = 0
+        self.chats = 0
+        self.wait_seconds = 0.0
+        self.flood_wait_seconds = 0
+        self.writer = None
+        self.media = None
+        self.failed = []
+        self.started = time.monotonic()
+
+    @staticmethod
+    def fetches_page(iterator):
+        """هل يرسل __anext__ التالي طلب صفحة؟ من حالة RequestIter في Telethon (buffer/index/left)
+
+        أول استدعاء يهيئ المكرر ويجلب الصفحة الأولى، وبعدها يُجلب طلب عند نفاد الصفحة الحالية
+        فقط إذا بقيت رسائل مطلوبة؛ فيُحصى ما يُرسل فعلاً في التصدير العادي و Takeout على حد سواء.
+        """
+        if iterator.buffer is None:
+            return True
+        return iterator.left > 0 and iterator.index == len(iterator.buffer)
+
+    def to_dict(self):
+        data = {
+            'mode': self.mode,
+            'chats': self.chats,
+            'messages': self.messages,
+            'requests': self.requests,
+            'wait_seconds': round(self.wait_seconds, 3),
+            'flood_wait_seconds': self.flood_wait_seconds,
+            'elapsed_seconds': round(time.monotonic() - self.started, 3)
+        }
+        if self.writer:
+            data['writer'] = self.writer
+        if self.media:
+            data['media'] = self.media
+        if self.failed:
+            data['failed'] = self.failed
+        return data
+
+class TelegramSuperScraper:
+    def __init__(self, config_file='config.ini'):
+        self.config_file = config_file
         self.sessions_dir = 'sessions'
         self.exports_dir = 'exports'
         self.logs_dir = 'logs'
+        self.checkpoints_file = os.path.join(self.exports_dir, 'checkpoints.json')
+        self.archive_db = os.path.join(self.exports_dir, 'archive.db')
+        # نقاط الاستئناف تُحفظ من خيوط الكتّاب الخلفيين لعدة محادثات متوازية في نفس الملف
+        self.checkpoints_lock = threading.Lock()
         self.current_client = None
         self.current_session = None
+        self.senders_file = os.path.join(self.exports_dir, 'senders.json')
+        self.entity_cache = None
+        self.sender_directory = None
         self.setup_directories()
         self.load_config()
     
@@ -67,6 +1750,10 @@ class TelegramSuperScraper:
             self.config.read(self.config_file, encoding='utf-8')
         else:
             self.create_default_config()
+        
+        self.serializer = get_serializer(self.config['SETTINGS'].get('json_backend', 'auto'))
+        self.json_pretty = self.config['SETTINGS'].get('json_pretty', 'false').lower() == 'true'
+        metrics.configure(self.config['SETTINGS'].get('metrics', 'false').lower() == 'true')
     
     def create_default_config(self):
         """إنشاء إعدادات افتراضية"""
@@ -78,7 +1765,28 @@ class TelegramSuperScraper:
         self.config['SETTINGS'] = {
             'language': 'arabic',
             'delay_between_requests': '2',
-            'max_members_per_request': '200'
+            'max_members_per_request': '200',
+            'export_format': 'json',
+            'export_flush_every': '500',
+            'incremental_export': 'false',
+            'archive_concurrency': '4',
+            'sqlite_batch_size': '500',
+            'entity_cache_ttl': '86400',
+            'export_writer_queue': '1000',
+            'json_backend': 'auto',
+            'json_pretty': 'false',
+            'debug': 'false',
+            'progress': 'auto',
+            'progress_interval': '1.0',
+            'tail_gap_check': '600',
+            'download_media': 'false',
+            'media_concurrency': '3',
+            'media_max_mb': '50',
+            'export_schema': 'compact',
+            'compact_run_size': '100000',
+            'stats_backend': 'auto',
+            'metrics': 'false',
+            'metrics_prometheus': ''
         }
         self.config['PROXY'] = {
             'enabled': 'false',
@@ -139,6 +1847,42 @@ class TelegramSuperScraper:
         
         print(f"{icons.get(msg_type, '[ ]')} {Colors.WHITE}{message}{Colors.RESET}")
     
+    def progress_reporter(self, unit, total=None, stats=None):
+        """مؤشر تقدم زمني؛ في وضع auto يُعطَّل عند توجيه المخرجات إلى ملف"""
+        mode = self.config['SETTINGS'].get('progress', 'auto').lower()
+        enabled = mode == 'on' or (mode == 'auto' and sys.stdout.isatty())
+        interval = float(self.config['SETTINGS'].get('progress_interval', '1.0'))
+        return ProgressReporter(self.print_message, unit, total, interval, enabled, stats)
+    
+    def save_metrics(self):
+        """حفظ ملخص القياسات في logs، ونسخة بصيغة Prometheus إذا حُدد ملفها في الإعدادات"""
+        if not metrics.enabled:
+            return None
+        report_file = f"{self.logs_dir}/metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            self.serializer.dump(metrics.to_dict(), f, self.json_pretty)
+        self.print_message('info', f'• القياسات: {report_file}')
+        
+        prometheus_file = self.config['SETTINGS'].get('metrics_prometheus', '')
+        if prometheus_file:
+            # كتابة ذرية حتى لا يقرأ الجامع ملفاً نصف مكتوب
+            tmp_file = prometheus_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                f.write(metrics.to_prometheus())
+            os.replace(tmp_file, prometheus_file)
+            self.print_message('info', f'• Prometheus: {prometheus_file}')
+        return report_file
+    
+    def print_debug_stats(self):
+        """عرض إحصاءات التشخيص عند تفعيل debug في الإعدادات"""
+        if self.config['SETTINGS'].get('debug', 'false').lower() != 'true':
+            return
+        stats = arabic_format_stats()
+        if stats:
+            self.print_message('info', f"[debug] ذاكرة التنسيق العربي: نسبة الإصابة {stats['hit_rate']:.1%} "
+                                       f"({stats['hits']}/{stats['hits'] + stats['misses']}) | "
+                                       f"مخزن {stats['cached']}/{stats['maxsize']} | بدون عربية {stats['skipped']}")
+    
     async def setup_credentials(self):
         """إعداد بيانات الدخول"""
         self.print_message('info', 'إعداد بيانات الدخول')
@@ -216,6 +1960,7 @@ class TelegramSuperScraper:
                 proxy = None
         
         session_path = os.path.join(self.sessions_dir, f"{session_name}.session" if session_name else "default.session")
+        from telethon import TelegramClient
         return TelegramClient(session_path, api_id, api_hash, proxy=proxy)
     
     async def list_sessions(self):
@@ -252,18 +1997,92 @@ class TelegramSuperScraper:
         
         client = self.get_client(session_name)
         if not client:
-            return None, None
+            return None, None
+        
+        try:
+            await client.start(phone=self.config['TELEGRAM']['phone'])
+            me = await client.get_me()
+            self.print_message('success', f'تم تسجيل الدخول كـ {me.first_name} (@{me.username})')
+            self.current_client = client
+            self.current_session = session_name
+            self.entity_cache = None
+            return client, session_name
+        except Exception as e:
+            self.print_message('error', f'فشل تسجيل الدخول: {str(e)}')
+            return None, None
+    
+    def get_entity_cache(self):
+        """ذاكرة الكيانات الخاصة بالجلسة الحالية (access_hash يختلف من حساب لآخر)"""
+        if self.entity_cache is None:
+            session_name = self.current_session or 'default'
+            ttl = int(self.config['SETTINGS'].get('entity_cache_ttl', '86400'))
+            cache_file = os.path.join(self.sessions_dir, f"{session_name}.entities.json")
+            self.entity_cache = EntityCache(cache_file, ttl, self.serializer)
+        return self.entity_cache
+    
+    def get_sender_directory(self):
+        """خريطة أسماء المرسلين المشتركة بين كل التصديرات"""
+        if self.sender_directory is None:
+            self.sender_directory = SenderDirectory(self.senders_file, self.serializer)
+        return self.sender_directory
+    
+    async def resolve_senders(self, senders, client=None, scheduler=None):
+        """حل المرسلين المجهولين في دفعة واحدة ثم حفظ الخريطة؛ الفشل لا يوقف التصدير"""
+        try:
+            resolved = await senders.resolve_unknown(client or self.current_client, scheduler)
+            if resolved:
+                self.print_message('info', f'• تم حل أسماء {resolved} مرسل')
+        except Exception as e:
+            self.print_message('warning', f'تعذر حل أسماء المرسلين: {str(e)}')
+        senders.save()
+    
+    async def resolve_entity(self, group_link, scheduler=None, stats=None):
+        """حل رابط المجموعة مع استخدام الذاكرة الدائمة لتجنب طلبات حل الأسماء"""
+        if not isinstance(group_link, str):
+            return group_link
+        
+        cache = self.get_entity_cache()
+        entity = cache.get(group_link)
+        if entity is not None:
+            return entity
+        
+        scheduler = scheduler or FloodWaitScheduler()
+        with metrics.timer('get_entity'):
+            entity = await scheduler.call(self.current_client.get_entity, group_link)
+        if stats is not None:
+            stats.requests += 1
+        cache.put(group_link, entity)
+        return entity
+    
+    def invalidate_entity(self, group_link, error):
+        """حذف الكيان من الذاكرة إذا فشل طلب بسبب بيانات قديمة"""
+        if isinstance(group_link, str) and isinstance(error, stale_peer_errors()):
+            return self.get_entity_cache().invalidate(group_link)
+        return False
+    
+    async def connect_session(self, session_name=None):
+        """الاتصال بجلسة محفوظة دون أي إدخال من المستخدم (للأوامر غير التفاعلية)"""
+        if session_name is None:
+            sessions = await self.list_sessions()
+            if len(sessions) != 1:
+                self.print_message('error', 'حدد الجلسة باستخدام --session')
+                return None
+            session_name = sessions[0]
+        
+        client = self.get_client(session_name)
+        if not client:
+            return None
         
-        try:
-            await client.start(phone=self.config['TELEGRAM']['phone'])
-            me = await client.get_me()
-            self.print_message('success', f'تم تسجيل الدخول كـ {me.first_name} (@{me.username})')
-            self.current_client = client
-            self.current_session = session_name
-            return client, session_name
-        except Exception as e:
-            self.print_message('error', f'فشل تسجيل الدخول: {str(e)}')
-            return None, None
+        await client.connect()
+        if not await client.is_user_authorized():
+            self.print_message('error', f'الجلسة {session_name} غير مسجلة، سجّل الدخول من القائمة التفاعلية أولاً')
+            await client.disconnect()
+            return None
+        
+        self.current_client = client
+        self.current_session = session_name
+        self.entity_cache = None
+        return client
     
     async def scrape_members(self, group_link):
         """جمع أعضاء المجموعة"""
@@ -273,7 +2092,7 @@ class TelegramSuperScraper:
         
         try:
             self.print_message('progress', 'جمع معلومات المجموعة...')
-            group = await self.current_client.get_entity(group_link)
+            group = await self.resolve_entity(group_link)
             
             self.print_message('info', f'المجموعة: {group.title}')
             
@@ -288,11 +2107,13 @@ class TelegramSuperScraper:
             
             members = []
             total_count = 0
+            progress = self.progress_reporter('عضو')
             
             self.print_message('progress', 'بدأ جمع الأعضاء...')
             
             async for user in self.current_client.iter_participants(group, aggressive=True):
                 total_count += 1
+                progress.update()
                 
                 # تطبيق الفلتر المختار
                 if filter_choice == '2' and not user.participant.admin:
@@ -314,9 +2135,6 @@ class TelegramSuperScraper:
                     'scraped_at': datetime.now().isoformat()
                 }
                 members.append(member_data)
-                
-                if len(members) % 50 == 0:
-                    self.print_message('progress', f'تم جمع {len(members)} من {total_count} عضو')
             
             # حفظ البيانات
             if members:
@@ -324,7 +2142,7 @@ class TelegramSuperScraper:
                 filename = f"{self.exports_dir}/members_{group.id}_{timestamp}.json"
                 
                 with open(filename, 'w', encoding='utf-8') as f:
-                    json.dump(members, f, ensure_ascii=False, indent=2)
+                    self.serializer.dump(members, f, self.json_pretty)
                 
                 self.print_message('success', f'تم حفظ {len(members)} عضو في {filename}')
                 return members
@@ -333,19 +2151,26 @@ class TelegramSuperScraper:
                 return []
                 
         except Exception as e:
+            self.invalidate_entity(group_link, e)
             self.print_message('error', f'خطأ في جمع الأعضاء: {str(e)}')
             return []
     
     async def transfer_members(self, source_group, target_group, members_file=None):
         """نقل الأعضاء بين المجموعات"""
+        from telethon.tl.functions.channels import InviteToChannelRequest
+        from telethon.tl.types import InputPeerUser
+        from telethon.errors import (
+            FloodWaitError, ChannelPrivateError, UserNotParticipantError, UserPrivacyRestrictedError
+        )
+        
         if not self.current_client:
             self.print_message('error', 'يجب تسجيل الدخول أولاً')
             return
         
         try:
             self.print_message('progress', 'جمع معلومات المجموعات...')
-            source = await self.current_client.get_entity(source_group)
-            target = await self.current_client.get_entity(target_group)
+            source = await self.resolve_entity(source_group)
+            target = await self.resolve_entity(target_group)
             
             self.print_message('info', f'المصدر: {source.title}')
             self.print_message('info', f'الهدف: {target.title}')
@@ -353,7 +2178,7 @@ class TelegramSuperScraper:
             # تحميل الأعضاء
             if members_file and os.path.exists(members_file):
                 with open(members_file, 'r', encoding='utf-8') as f:
-                    members = json.load(f)
+                    members = self.serializer.load(f)
                 self.print_message('info', f'تم تحميل {len(members)} عضو من الملف')
             else:
                 members = await self.scrape_members(source_group)
@@ -379,7 +2204,8 @@ class TelegramSuperScraper:
                     user = InputPeerUser(member['id'], member['access_hash'])
                     
                     # دعوة المستخدم
-                    await self.current_client(InviteToChannelRequest(target, [user]))
+                    with metrics.timer('invite'):
+                        await self.current_client(InviteToChannelRequest(target, [user]))
                     
                     transferred += 1
                     name = f"{member['first_name']} {member['last_name']}".strip() or f"User_{member['id']}"
@@ -391,6 +2217,7 @@ class TelegramSuperScraper:
                         
                 except FloodWaitError as e:
                     wait_time = e.seconds
+                    metrics.flood_wait('invite', wait_time)
                     self.print_message('warning', f'تم تقييد الحساب، الانتظار {wait_time} ثانية...')
                     await asyncio.sleep(wait_time)
                     continue
@@ -414,7 +2241,7 @@ class TelegramSuperScraper:
             
             report_file = f"{self.logs_dir}/transfer_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             with open(report_file, 'w', encoding='utf-8') as f:
-                json.dump(report, f, ensure_ascii=False, indent=2)
+                self.serializer.dump(report, f, self.json_pretty)
             
             self.print_message('success', f'اكتمل النقل!')
             self.print_message('info', f'• تم نقل: {transferred} عضو')
@@ -422,67 +2249,935 @@ class TelegramSuperScraper:
             self.print_message('info', f'• التقرير: {report_file}')
             
         except Exception as e:
+            self.invalidate_entity(source_group, e)
+            self.invalidate_entity(target_group, e)
             self.print_message('error', f'خطأ في النقل: {str(e)}')
     
-    async def export_messages(self, group_link, limit=1000):
+    def read_checkpoints(self):
+        if os.path.exists(self.checkpoints_file):
+            with open(self.checkpoints_file, 'r', encoding='utf-8') as f:
+                return self.serializer.load(f)
+        return {}
+    
+    def load_checkpoint(self, group_id):
+        """تحميل نقطة الاستئناف لمجموعة"""
+        with self.checkpoints_lock:
+            return ExportCheckpoint(self.read_checkpoints().get(str(group_id)))
+    
+    def save_checkpoint(self, group_id, checkpoint):
+        """حفظ نقطة الاستئناف بشكل ذري؛ القراءة والتعديل والاستبدال تحت قفل واحد"""
+        data = checkpoint.to_dict()
+        with self.checkpoints_lock:
+            checkpoints = self.read_checkpoints()
+            checkpoints[str(group_id)] = data
+            
+            # اسم مؤقت لكل خيط حتى لا تتداخل كتابة عمليتين على نفس الملف
+            tmp_file = f'{self.checkpoints_file}.{os.getpid()}.{threading.get_ident()}.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                self.serializer.dump(checkpoints, f)
+            os.replace(tmp_file, self.checkpoints_file)
+    
+    def compact_schema(self):
+        """صيغة الملفات: compact (رأس للمحادثة + صفوف) أو legacy (قاموس كامل لكل رسالة)"""
+        return self.config['SETTINGS'].get('export_schema', 'compact').lower() != 'legacy'
+    
+    async def timed_messages(self, client, group, stats, scheduler=None, limit=None, **kwargs):
+        """تغليف iter_messages لقياس زمن الانتظار وعدد الطلبات مع الاستئناف بعد FloodWait"""
+        from telethon.errors import FloodWaitError
+        scheduler = scheduler or FloodWaitScheduler()
+        fetched = 0
+        while limit is None or fetched < limit:
+            remaining = None if limit is None else limit - fetched
+            iterator = client.iter_messages(group, limit=remaining, **kwargs).__aiter__()
+            try:
+                while True:
+                    await scheduler.wait_ready()
+                    # Telethon يجلب صفحة كاملة عند أول عنصر منها؛ باقي العناصر من الذاكرة
+                    fetching = stats.fetches_page(iterator)
+                    if fetching:
+                        stats.requests += 1
+                    started = time.monotonic()
+                    try:
+                        message = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    finally:
+                        elapsed = time.monotonic() - started
+                        stats.wait_seconds += elapsed
+                        if fetching and metrics.enabled:
+                            metrics.observe('iter_messages.page', elapsed)
+                    fetched += 1
+                    stats.messages += 1
+                    # نقطة الاستئناف إذا انقطع التكرار بسبب FloodWait
+                    if kwargs.get('reverse'):
+                        kwargs['min_id'] = message.id
+                    else:
+                        kwargs['offset_id'] = message.id
+                    yield message
+            except FloodWaitError as e:
+                self.print_message('warning', f'تم تقييد الحساب، الانتظار {e.seconds} ثانية...')
+                scheduler.penalize(e.seconds, 'iter_messages')
+                stats.flood_wait_seconds += e.seconds
+                continue
+            break
+    
+    async def iter_history(self, group, limit=1000, checkpoint=None, client=None, stats=None,
+                           wait_time=None, scheduler=None, filters=None, media=None):
+        """جلب الرسائل؛ في الوضع التزايدي يبدأ من نقطة الاستئناف"""
+        if media:
+            # تسجيل المرفقات للتحميل في الخلفية دون إيقاف تدفق الرسائل
+            async for message in self.iter_history(group, limit, checkpoint, client, stats, wait_time,
+                                                   scheduler, filters):
+                media.submit(group.id, message)
+                yield message
+            return
+        
+        client = client or self.current_client
+        stats = stats or ExportStats()
+        fetch = dict(scheduler=scheduler, wait_time=wait_time)
+        if filters:
+            async for message in self.filtered_messages(client, group, stats, limit, filters, **fetch):
+                yield message
+            return
+        if checkpoint is None:
+            async for message in self.timed_messages(client, group, stats, limit=limit, **fetch):
+                yield message
+            return
+        
+        remaining = limit
+        
+        # الرسائل الأحدث من آخر تصدير، من الأقدم للأحدث حتى لا تبقى فجوات عند الانقطاع
+        if checkpoint.max_id:
+            async for message in self.timed_messages(client, group, stats, min_id=checkpoint.max_id, reverse=True,
+                                                     limit=remaining, **fetch):
+                checkpoint.observe(message.id)
+                yield message
+                if remaining is not None:
+                    remaining -= 1
+        
+        if checkpoint.backfill_done or remaining == 0:
+            return
+        
+        # استكمال السجل الأقدم من حيث توقف التصدير السابق
+        fetched = 0
+        async for message in self.timed_messages(client, group, stats, offset_id=checkpoint.min_id,
+                                                 limit=remaining, **fetch):
+            checkpoint.observe(message.id)
+            fetched += 1
+            yield message
+        
+        if remaining is None or fetched < remaining:
+            checkpoint.backfill_done = True
+    
+    async def filtered_messages(self, client, group, stats, limit, filters, **fetch):
+        """جلب مع فلاتر يطبقها تليجرام، ثم ما تبقى منها على التدفق"""
+        # الحد يُمرر للخادم فقط إذا لم يكن هناك فلتر محلي يسقط رسائل
+        server_limit = None if filters.stream_only else limit
+        history = self.timed_messages(client, group, stats, limit=server_limit, **filters.to_kwargs(), **fetch)
+        count = 0
+        try:
+            async for message in history:
+                if filters.past_range(message):
+                    break
+                if not filters.accept(message):
+                    continue
+                yield message
+                count += 1
+                if limit is not None and count >= limit:
+                    break
+        finally:
+            await history.aclose()
+    
+    async def export_messages(self, group_link, limit=1000, export_format=None, incremental=None,
+                              client=None, stats=None, wait_time=None, filters=None, media=None):
         """تصدير رسائل المجموعة"""
         if not self.current_client:
             self.print_message('error', 'يجب تسجيل الدخول أولاً')
-            return
+            return None
         
         try:
-            self.print_message('progress', 'جمع معلومات المجموعة...')
-            group = await self.current_client.get_entity(group_link)
+            return await self.export_chat(group_link, limit, export_format, incremental, client=client,
+                                          stats=stats, wait_time=wait_time, filters=filters, media=media)
+        except Exception as e:
+            self.print_message('error', f'خطأ في جمع الرسائل: {str(e)}')
+            return None
+    
+    async def export_chat(self, group_link, limit=1000, export_format=None, incremental=None,
+                          client=None, stats=None, wait_time=None, scheduler=None, filters=None, media=None):
+        """تصدير محادثة واحدة؛ الأخطاء تُرفع للمستدعي"""
+        if export_format is None:
+            export_format = self.config['SETTINGS'].get('export_format', 'json')
+        export_format = export_format.lower()
+        if incremental is None:
+            incremental = self.config['SETTINGS'].get('incremental_export', 'false').lower() == 'true'
+        scheduler = scheduler or FloodWaitScheduler()
+        own_stats = stats is None
+        if own_stats:
+            stats = ExportStats()
+        
+        self.print_message('progress', 'جمع معلومات المجموعة...')
+        group = await self.resolve_entity(group_link, scheduler, stats)
+        
+        # عمال التحميل يبدؤون بعد حل الكيان حتى لا يتركهم رابط خاطئ معلقين مع manifest مفتوح
+        own_media = media is None
+        if own_media:
+            media = self.media_downloader()
+        senders = self.get_sender_directory()
+        options = dict(client=client, stats=stats, wait_time=wait_time, scheduler=scheduler, filters=filters,
+                       media=media, senders=senders)
+        
+        try:
+            try:
+                await self.export_group(group, limit, export_format, incremental, **options)
+            except stale_peer_errors() as e:
+                if not self.invalidate_entity(group_link, e):
+                    raise
+                # الكيان المخزن قديم: إعادة الحل مرة واحدة ثم إعادة المحاولة
+                self.print_message('warning', 'بيانات المجموعة المخزنة قديمة، إعادة الحل...')
+                group = await self.resolve_entity(group_link, scheduler, stats)
+                await self.export_group(group, limit, export_format, incremental, **options)
+        except BaseException:
+            if own_media and media:
+                await media.abort()
+            raise
+        
+        # ما لم يُحل قبل كتابة الملف النصي (التصدير المتدفق) يبقى محفوظاً للتصديرات التالية
+        await self.resolve_senders(senders, client, scheduler)
+        if own_media and media:
+            await self.finish_media(media, stats)
+        if own_stats:
+            self.print_export_stats(stats)
+        return stats
+    
+    async def export_group(self, group, limit, export_format, incremental, stats, senders, **history):
+        """تصدير رسائل كيان تم حله مسبقاً إلى الصيغة المطلوبة"""
+        self.print_message('info', f'المجموعة: {group.title}')
+        
+        stats.chats += 1
+        history['stats'] = stats
+        
+        checkpoint = None
+        if incremental and history.get('filters'):
+            # نقطة الاستئناف تصف السجل الكامل ولا تصلح لتصدير جزئي
+            self.print_message('warning', 'التصدير التزايدي لا يعمل مع الفلاتر، سيتم تصدير النتائج كاملة')
+        elif incremental:
+            checkpoint = self.load_checkpoint(group.id)
+            if checkpoint.max_id:
+                self.print_message('info', f'تصدير تزايدي من الرسالة {checkpoint.max_id}')
+        
+        if export_format in ('jsonl', 'sqlite'):
+            if export_format == 'sqlite':
+                await self.export_messages_sqlite(group, limit, checkpoint, senders, **history)
+            else:
+                await self.export_messages_stream(group, limit, checkpoint, senders, **history)
+            return
+        
+        messages = []
+        self.print_message('progress', 'جمع الرسائل...')
+        
+        progress = self.progress_reporter('رسالة', limit, stats)
+        async for message in self.iter_history(group, limit, checkpoint, **history):
+            senders.observe(message)
+            messages.append(MessageRecord.from_message(message))
+            progress.update()
+        
+        # حفظ الرسائل
+        if messages:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            json_file = f"{self.exports_dir}/messages_{group.id}_{timestamp}.json"
+            txt_file = f"{self.exports_dir}/messages_{group.id}_{timestamp}.txt"
             
-            self.print_message('info', f'المجموعة: {group.title}')
+            # السجل كله في الذاكرة، فالمرسلون المجهولون يُحلون قبل كتابة الملف النصي
+            await self.resolve_senders(senders, history.get('client'), history.get('scheduler'))
+            # التسلسل والكتابة في خيط حتى لا تتوقف التصديرات المتوازية الأخرى على نفس الحلقة
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.write_json_export, group, messages, json_file, txt_file,
+                                       senders.names)
+            metrics.add_file('json', json_file)
+            metrics.add_file('txt', txt_file)
             
-            messages = []
-            self.print_message('progress', 'جمع الرسائل...')
-            
-            async for message in self.current_client.iter_messages(group, limit=limit):
-                msg_data = {
-                    'id': message.id,
-                    'date': message.date.isoformat() if message.date else None,
-                    'sender_id': message.sender_id,
-                    'text': message.text or '',
-                    'has_media': bool(message.media),
-                    'group_id': group.id,
-                    'group_name': group.title
-                }
-                messages.append(msg_data)
-                
-                if len(messages) % 100 == 0:
-                    self.print_message('progress', f'تم جمع {len(messages)} رسالة')
+            self.print_message('success', f'تم حفظ {len(messages)} رسالة')
+            self.print_message('info', f'• ملف JSON: {json_file}')
+            self.print_message('info', f'• ملف نصي: {txt_file}')
+        else:
+            self.print_message('warning', 'لم يتم العثور على رسائل')
+        
+        if checkpoint:
+            self.save_checkpoint(group.id, checkpoint)
+    
+    def write_json_export(self, group, messages, json_file, txt_file, names=None):
+        """كتابة لقطة JSON كاملة وملفها النصي من رسائل مجمعة في الذاكرة (تعمل خارج حلقة الأحداث)"""
+        if self.compact_schema():
+            data = MessageRecord.header(group.id, group.title)
+            data['rows'] = [record.to_row() for record in messages]
+        else:
+            data = [record.to_dict(group.id, group.title) for record in messages]
+        with open(json_file, 'w', encoding='utf-8') as f:
+            self.serializer.dump(data, f, self.json_pretty)
+        
+        with open(txt_file, 'w', encoding='utf-8') as f:
+            f.write(f"رسائل مجموعة: {group.title}\n")
+            f.write(f"عدد الرسائل: {len(messages)}\n")
+            f.write("="*50 + "\n\n")
             
-            # حفظ الرسائل
-            if messages:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                # JSON
-                json_file = f"{self.exports_dir}/messages_{group.id}_{timestamp}.json"
-                with open(json_file, 'w', encoding='utf-8') as f:
-                    json.dump(messages, f, ensure_ascii=False, indent=2)
-                
-                # TXT
-                txt_file = f"{self.exports_dir}/messages_{group.id}_{timestamp}.txt"
-                with open(txt_file, 'w', encoding='utf-8') as f:
-                    f.write(f"رسائل مجموعة: {group.title}\n")
-                    f.write(f"عدد الرسائل: {len(messages)}\n")
-                    f.write("="*50 + "\n\n")
-                    
+            for record in messages:
+                f.write(render_txt_message(record, names))
+    
+    async def write_history(self, group, limit, checkpoint, write, flush, flush_every, queue_size, senders,
+                            **history):
+        """تغذية مصرف الكتابة بالرسائل: مباشرة على الحلقة أو عبر كاتب خلفي بطابور محدود"""
+        count = 0
+        progress = self.progress_reporter('رسالة', limit, history.get('stats'))
+        if not queue_size:
+            async for message in self.iter_history(group, limit, checkpoint, **history):
+                senders.observe(message)
+                write(MessageRecord.from_message(message))
+                count += 1
+                progress.update()
+            return count
+        
+        # نقطة الاستئناف تُحفظ من خيط الكاتب فقط بعد كتابة كل الرسائل التي سبقتها
+        on_commit = None
+        if checkpoint:
+            on_commit = lambda snapshot: self.save_checkpoint(group.id, snapshot)
+        
+        writer = BackgroundWriter(write, flush, queue_size, on_commit=on_commit)
+        writer.start()
+        try:
+            async for message in self.iter_history(group, limit, checkpoint, **history):
+                senders.observe(message)
+                await writer.put(MessageRecord.from_message(message))
+                count += 1
+                progress.update()
+                if checkpoint and count % flush_every == 0:
+                    await writer.commit(ExportCheckpoint(checkpoint.to_dict()))
+            await writer.close()
+        except BaseException:
+            await writer.abort()
+            raise
+        
+        if checkpoint:
+            self.save_checkpoint(group.id, checkpoint)
+        
+        stats = history.get('stats')
+        if stats:
+            stats.writer = writer.to_dict()
+        self.print_message('info', f"• الطابور: أقصى عمق {writer.max_depth} | انتظار الجالب "
+                                   f"{writer.producer_blocked:.2f} ث | انتظار الكاتب {writer.writer_idle:.2f} ث")
+        return count
+    
+    async def export_messages_stream(self, group, limit=1000, checkpoint=None, senders=None, **history):
+        """تصدير متدفق: كل رسالة تُكتب فور وصولها بذاكرة ثابتة"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        jsonl_file = f"{self.exports_dir}/messages_{group.id}_{timestamp}.jsonl"
+        txt_file = f"{self.exports_dir}/messages_{group.id}_{timestamp}.txt"
+        flush_every = int(self.config['SETTINGS'].get('export_flush_every', '500'))
+        queue_size = int(self.config['SETTINGS'].get('export_writer_queue', '1000'))
+        senders = senders or self.get_sender_directory()
+        
+        # حفظ نقطة الاستئناف بعد كل دفعة مكتوبة على القرص فقط (وعند الإغلاق حتى لو انقطع التصدير)
+        on_flush = None
+        if checkpoint and not queue_size:
+            on_flush = lambda: self.save_checkpoint(group.id, checkpoint)
+        
+        self.print_message('progress', 'جمع الرسائل (تصدير متدفق)...')
+        
+        with StreamingExportWriter(jsonl_file, txt_file, group.id, group.title, flush_every, on_flush=on_flush,
+                                   serializer=self.serializer, compact=self.compact_schema(),
+                                   names=senders.names) as writer:
+            await self.write_history(group, limit, checkpoint, writer.write, writer.flush,
+                                     flush_every, queue_size, senders, **history)
+        
+        if writer.count:
+            self.print_message('success', f'تم حفظ {writer.count} رسالة')
+            self.print_message('info', f'• ملف JSONL: {jsonl_file}')
+            self.print_message('info', f'• ملف نصي: {txt_file}')
+        else:
+            os.remove(jsonl_file)
+            os.remove(txt_file)
+            self.print_message('warning', 'لم يتم العثور على رسائل')
+        return writer.count
+    
+    async def export_messages_sqlite(self, group, limit=1000, checkpoint=None, senders=None, **history):
+        """تصدير إلى أرشيف SQLite؛ إعادة التصدير تحدّث الرسائل الموجودة بدل تكرارها"""
+        batch_size = int(self.config['SETTINGS'].get('sqlite_batch_size', '500'))
+        queue_size = int(self.config['SETTINGS'].get('export_writer_queue', '1000'))
+        senders = senders or self.get_sender_directory()
+        
+        on_commit = None
+        if checkpoint and not queue_size:
+            on_commit = lambda: self.save_checkpoint(group.id, checkpoint)
+        
+        self.print_message('progress', 'جمع الرسائل (أرشيف SQLite)...')
+        
+        with MessageArchive(self.archive_db, batch_size, on_commit=on_commit) as archive:
+            archive.upsert_chat(group.id, group.title)
+            write = functools.partial(archive.add, group.id)
+            await self.write_history(group, limit, checkpoint, write, archive.commit,
+                                     batch_size, queue_size, senders, **history)
+        
+        if archive.count:
+            self.print_message('success', f'تم حفظ {archive.count} رسالة')
+            self.print_message('info', f'• قاعدة البيانات: {self.archive_db}')
+        else:
+            self.print_message('warning', 'لم يتم العثور على رسائل')
+        return archive.count
+    
+    def media_downloader(self):
+        """مرحلة تحميل الوسائط إذا كانت مفعلة في الإعدادات (تبدأ عمالها فوراً)"""
+        if self.config['SETTINGS'].get('download_media', 'false').lower() != 'true':
+            return None
+        concurrency = int(self.config['SETTINGS'].get('media_concurrency', '3'))
+        max_mb = float(self.config['SETTINGS'].get('media_max_mb', '50'))
+        media = MediaDownloader(
+            self.current_client, os.path.join(self.exports_dir, 'media'), concurrency,
+            int(max_mb * 1024 * 1024) if max_mb else None, self.serializer,
+            self.print_message, self.progress_reporter('ملف')
+        )
+        media.start()
+        return media
+    
+    async def finish_media(self, media, stats=None):
+        """انتظار لحاق تحميل الوسائط بالتصدير ثم عرض ملخصه"""
+        if media.pending:
+            self.print_message('progress', f'انتظار تحميل {media.pending} ملف...')
+        await media.close()
+        data = media.to_dict()
+        if stats:
+            stats.media = data
+        self.print_message('info', f"• الوسائط: {data['downloaded']} ملف جديد | {data['deduplicated']} مكرر | "
+                                   f"{data['skipped_too_large']} تجاوز الحد | {data['failed']} فشل | "
+                                   f"{data['bytes'] / 1048576:.1f} MB | FloodWait: {data['flood_wait_seconds']} ث")
+    
+    def expand_export(self, export_file, output_file=None):
+        """تحويل ملف تصدير مضغوط إلى الشكل القديم (قاموس كامل لكل رسالة) للأدوات التي تعتمد عليه"""
+        if not os.path.exists(export_file):
+            self.print_message('error', f'الملف غير موجود: {export_file}')
+            return None
+        root, ext = os.path.splitext(export_file)
+        output_file = output_file or f'{root}_legacy{ext}'
+        
+        try:
+            messages = read_export(export_file, self.serializer)
+            count = 0
+            with open(output_file, 'w', encoding='utf-8') as f:
+                if output_file.endswith('.jsonl'):
                     for msg in messages:
-                        f.write(f"[{msg['date']}] User_{msg['sender_id']}:\n")
-                        f.write(f"{msg['text'][:200]}\n")
-                        f.write("-"*40 + "\n")
-                
-                self.print_message('success', f'تم حفظ {len(messages)} رسالة')
-                self.print_message('info', f'• ملف JSON: {json_file}')
-                self.print_message('info', f'• ملف نصي: {txt_file}')
+                        f.write(self.serializer.dumps(msg) + '\n')
+                        count += 1
+                else:
+                    messages = list(messages)
+                    count = len(messages)
+                    self.serializer.dump(messages, f, self.json_pretty)
+        except ValueError as e:
+            self.print_message('error', str(e))
+            return None
+        
+        self.print_message('success', f'تم تحويل {count} رسالة')
+        self.print_message('info', f'• الملف: {output_file}')
+        return output_file
+    
+    def export_snapshots(self):
+        """ملفات التصدير مجمعة بحسب المحادثة، من الأقدم للأحدث (الأرشيف المدمج أولاً)"""
+        snapshots = {}
+        for name in os.listdir(self.exports_dir):
+            match = EXPORT_FILE_PATTERN.match(name)
+            if match:
+                stamp = match.group(2)
+                snapshots.setdefault(int(match.group(1)), []).append((stamp != 'archive', stamp, name))
+        return {
+            chat_id: [os.path.join(self.exports_dir, name) for _, _, name in sorted(files)]
+            for chat_id, files in snapshots.items()
+        }
+    
+    def compact_exports(self, chat_ids=None, keep=False):
+        """دمج لقطات التصدير المتكررة لكل محادثة في messages_<id>_archive.jsonl وحذف الأصول"""
+        snapshots = self.export_snapshots()
+        if chat_ids:
+            snapshots = {chat_id: files for chat_id, files in snapshots.items() if chat_id in chat_ids}
+        if not snapshots:
+            self.print_message('warning', 'لا توجد ملفات تصدير للدمج')
+            return None
+        
+        run_size = int(self.config['SETTINGS'].get('compact_run_size', '100000'))
+        compactor = ExportCompactor(self.serializer, run_size)
+        started = time.monotonic()
+        results = []
+        
+        for chat_id, files in snapshots.items():
+            output_file = os.path.join(self.exports_dir, f'messages_{chat_id}_archive.jsonl')
+            if files == [output_file]:
+                continue
+            # الملف النصي المرافق لكل لقطة هو عرض لنفس الرسائل
+            companions = [os.path.splitext(path)[0] + '.txt' for path in files]
+            companions = [path for path in companions if os.path.exists(path)]
+            bytes_before = sum(os.path.getsize(path) for path in files + companions)
+            
+            self.print_message('progress', f'دمج {len(files)} ملف للمحادثة {chat_id}...')
+            try:
+                chat, rows_read, rows_written = compactor.compact(files, output_file)
+            except (ValueError, KeyError, OSError) as e:
+                self.print_message('error', f'فشل دمج {chat_id}: {str(e)}')
+                results.append({'chat_id': chat_id, 'status': 'failed', 'error': str(e)})
+                continue
+            if not rows_written:
+                continue
+            
+            if not keep:
+                for path in files + companions:
+                    if path != output_file:
+                        os.remove(path)
+            remaining = set(files + companions + [output_file])
+            bytes_after = sum(os.path.getsize(path) for path in remaining if os.path.exists(path))
+            
+            result = {
+                'chat_id': chat_id,
+                'title': chat['title'],
+                'status': 'ok',
+                'files': len(files),
+                'rows_read': rows_read,
+                'rows_written': rows_written,
+                'duplicates': rows_read - rows_written,
+                'bytes_before': bytes_before,
+                'bytes_after': bytes_after,
+                'reclaimed_bytes': bytes_before - bytes_after
+            }
+            results.append(result)
+            self.print_message('info', f"{chat['title']}: {len(files)} ملف → {rows_written} رسالة "
+                                       f"(حُذف {result['duplicates']} مكرر) | تم توفير "
+                                       f"{result['reclaimed_bytes'] / 1048576:.1f} MB")
+        
+        succeeded = [r for r in results if r['status'] == 'ok']
+        report = {
+            'chats': len(results),
+            'rows_read': sum(r['rows_read'] for r in succeeded),
+            'rows_written': sum(r['rows_written'] for r in succeeded),
+            'reclaimed_bytes': sum(r['reclaimed_bytes'] for r in succeeded),
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'results': results,
+            'compact_date': datetime.now().isoformat()
+        }
+        
+        report_file = f"{self.logs_dir}/compact_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            self.serializer.dump(report, f, self.json_pretty)
+        
+        if results:
+            self.print_message('success', f"تم دمج {len(succeeded)} محادثة: {report['rows_read']} صف → "
+                                          f"{report['rows_written']} | تم توفير "
+                                          f"{report['reclaimed_bytes'] / 1048576:.1f} MB")
+        else:
+            self.print_message('info', 'كل المحادثات مدمجة بالفعل')
+        self.print_message('info', f'• التقرير: {report_file}')
+        return report
+    
+    def search_archive(self, query, chat_id=None, since=None, until=None, sender_id=None, limit=50):
+        """البحث في أرشيف SQLite دون تحميل ملفات JSON"""
+        if not os.path.exists(self.archive_db):
+            self.print_message('warning', 'لا يوجد أرشيف بعد، صدّر الرسائل بصيغة sqlite أولاً')
+            return []
+        
+        try:
+            with MessageArchive(self.archive_db) as archive:
+                results = archive.search(query, chat_id, since, until, sender_id, limit)
+        except sqlite3.OperationalError as e:
+            self.print_message('error', f'استعلام بحث غير صالح: {str(e)}')
+            return []
+        
+        if not results:
+            self.print_message('warning', 'لا توجد نتائج')
+            return []
+        
+        self.print_message('success', f'تم العثور على {len(results)} نتيجة')
+        senders = self.get_sender_directory()
+        for chat_id, title, message_id, date, sender_id, text in results:
+            print(f"{Colors.CYAN}[{date}] {Colors.GREEN}{title} #{message_id}{Colors.WHITE} {senders.display(sender_id)}:")
+            print(f"    {text[:200]}")
+        return results
+    
+    def archive_summary(self):
+        """ملخص أرشيف SQLite: عدد الرسائل والمدى الزمني لكل محادثة"""
+        if not os.path.exists(self.archive_db):
+            self.print_message('warning', 'لا يوجد أرشيف بعد، صدّر الرسائل بصيغة sqlite أولاً')
+            return []
+        
+        with MessageArchive(self.archive_db) as archive:
+            rows = archive.conn.execute(
+                "SELECT m.chat_id, c.title, COUNT(*), MIN(m.date), MAX(m.date) "
+                "FROM messages m LEFT JOIN chats c ON c.chat_id = m.chat_id "
+                "GROUP BY m.chat_id ORDER BY COUNT(*) DESC"
+            ).fetchall()
+        
+        for chat_id, title, count, first_date, last_date in rows:
+            self.print_message('info', f'{title} ({chat_id}): {count} رسالة | {first_date} → {last_date}')
+        return rows
+    
+    def message_statistics(self, chat_ids=None, source='files', top=10):
+        """إحصاءات الرسائل في تمريرة واحدة على ملفات التصدير أو أرشيف SQLite، مع تقرير JSON/TXT في logs/"""
+        backend = self.config['SETTINGS'].get('stats_backend', 'auto').lower()
+        numpy = load_numpy(backend)
+        engines = {}
+        titles = {}
+        started = time.monotonic()
+        progress = self.progress_reporter('رسالة')
+        
+        def engine_for(chat_id):
+            if chat_id not in engines:
+                engines[chat_id] = StatsEngine(numpy)
+            return engines[chat_id]
+        
+        if source == 'sqlite':
+            if not os.path.exists(self.archive_db):
+                self.print_message('warning', 'لا يوجد أرشيف بعد، صدّر الرسائل بصيغة sqlite أولاً')
+                return None
+            sql = "SELECT chat_id, date, sender_id, length(text), has_media FROM messages WHERE deleted = 0"
+            if chat_ids:
+                sql += f" AND chat_id IN ({', '.join('?' * len(chat_ids))})"
+            with MessageArchive(self.archive_db) as archive:
+                titles.update(archive.conn.execute("SELECT chat_id, title FROM chats"))
+                for chat_id, date, sender_id, length, has_media in archive.conn.execute(sql, list(chat_ids or [])):
+                    date = int(datetime.fromisoformat(date).timestamp()) if date else None
+                    engine_for(chat_id).add(date, sender_id, length or 0, has_media)
+                    progress.update()
+        else:
+            snapshots = self.export_snapshots()
+            if chat_ids:
+                snapshots = {chat_id: files for chat_id, files in snapshots.items() if chat_id in chat_ids}
+            for chat_id, files in snapshots.items():
+                if len(files) > 1:
+                    self.print_message('warning', f'المحادثة {chat_id} لها {len(files)} لقطات تصدير قد تتداخل؛ '
+                                                  f'شغّل compact أولاً لتجنب العد المكرر')
+                engine = engine_for(chat_id)
+                for path in files:
+                    chat = None
+                    for chat, rows in iter_export_rows(path, self.serializer):
+                        engine.add_rows(rows)
+                        progress.update(len(rows))
+                    if chat:
+                        titles[chat_id] = chat['title']
+        
+        if not engines:
+            self.print_message('warning', 'لا توجد رسائل لحساب الإحصاءات')
+            return None
+        
+        report = {
+            'source': source,
+            'backend': 'numpy' if numpy is not None else 'python',
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'generated_at': datetime.now().isoformat(),
+            'chats': {
+                str(chat_id): {'title': titles.get(chat_id), **engine.to_dict(top)}
+                for chat_id, engine in engines.items()
+            }
+        }
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        json_file = f"{self.logs_dir}/stats_report_{timestamp}.json"
+        with open(json_file, 'w', encoding='utf-8') as f:
+            self.serializer.dump(report, f, self.json_pretty)
+        
+        txt_file = f"{self.logs_dir}/stats_report_{timestamp}.txt"
+        senders = self.get_sender_directory()
+        with open(txt_file, 'w', encoding='utf-8') as f:
+            for chat_id, data in report['chats'].items():
+                f.write(f"{data['title']} ({chat_id})\n")
+                f.write("="*50 + "\n")
+                f.write(f"الرسائل: {data['messages']} | الأيام النشطة: {data['active_days']} | "
+                        f"الفترة: {data['first_date']} → {data['last_date']}\n")
+                f.write(f"نسبة الوسائط: {data['media_ratio']:.1%} | طول النص: متوسط {data['text_length']['mean']} | "
+                        f"p50 {data['text_length']['p50']} | p90 {data['text_length']['p90']}\n")
+                f.write(f"\nأكثر المرسلين ({data['distinct_senders']} مرسل):\n")
+                for sender_id, count in data['top_senders']:
+                    f.write(f"  {senders.display(sender_id)}: {count}\n")
+                f.write("\nأكثر الأيام نشاطاً:\n")
+                for day, count in data['busiest_days']:
+                    f.write(f"  {day}: {count}\n")
+                f.write("\nتوزيع أطوال النصوص:\n")
+                for bucket, count in data['text_length']['buckets'].items():
+                    f.write(f"  {bucket}: {count}\n")
+                f.write("\n")
+        
+        for chat_id, data in report['chats'].items():
+            self.print_message('info', f"{data['title']}: {data['messages']} رسالة | {data['distinct_senders']} مرسل | "
+                                       f"وسائط {data['media_ratio']:.1%} | طول النص p50 {data['text_length']['p50']}")
+        self.print_message('success', f"اكتملت الإحصاءات في {report['elapsed_seconds']} ث ({report['backend']})")
+        self.print_message('info', f'• التقرير: {json_file}')
+        self.print_message('info', f'• ملف نصي: {txt_file}')
+        return report
+    
+    def print_export_stats(self, stats):
+        """عرض عدد الطلبات وزمن الانتظار لعملية التصدير"""
+        data = stats.to_dict()
+        self.print_message('info', f"• الطلبات: {data['requests']} | الانتظار: {data['wait_seconds']} ث | "
+                                   f"FloodWait: {data['flood_wait_seconds']} ث | المدة: {data['elapsed_seconds']} ث")
+    
+    async def export_takeout(self, group_links, limit=None, export_format=None, incremental=None, filters=None):
+        """تصدير محادثة أو أكثر عبر جلسة Takeout بحدود طلبات أوسع"""
+        from telethon.errors import TakeoutInitDelayError
+        
+        if not self.current_client:
+            self.print_message('error', 'يجب تسجيل الدخول أولاً')
+            return None
+        
+        stats = ExportStats(mode='takeout')
+        media = self.media_downloader()
+        self.print_message('progress', 'فتح جلسة Takeout...')
+        
+        try:
+            try:
+                # يتم إنهاء الجلسة تلقائياً عند الخروج، وتُعلَّم كفاشلة إذا انقطع التصدير أو فشلت أي محادثة
+                async with self.current_client.takeout(finalize=True, users=True, chats=True,
+                                                       megagroups=True, channels=True) as takeout:
+                    for group_link in group_links:
+                        try:
+                            await self.export_chat(group_link, limit, export_format, incremental,
+                                                   client=takeout, stats=stats, wait_time=0, filters=filters,
+                                                   media=media)
+                        except Exception as e:
+                            # فشل محادثة لا يوقف باقي الجلسة
+                            self.print_message('error', f'فشل تصدير {group_link}: {str(e)}')
+                            stats.failed.append({'chat': str(group_link), 'error': str(e)})
+                    takeout.success = not stats.failed
+            except BaseException:
+                if media:
+                    await media.abort()
+                raise
+        except TakeoutInitDelayError as e:
+            self.print_message('warning', f'يجب تأكيد طلب التصدير من تطبيق تليجرام، أعد المحاولة بعد {e.seconds} ثانية')
+            return None
+        except Exception as e:
+            self.print_message('error', f'خطأ في جلسة Takeout: {str(e)}')
+            return None
+        
+        # الوسائط تُحمَّل عبر العميل العادي وقد تكمل بعد إغلاق جلسة Takeout
+        if media:
+            await self.finish_media(media, stats)
+        
+        succeeded = len(group_links) - len(stats.failed)
+        if stats.failed:
+            self.print_message('warning', f'اكتمل التصدير عبر Takeout مع أخطاء: نجح {succeeded} وفشل '
+                                          f'{len(stats.failed)} محادثة، {stats.messages} رسالة')
+        else:
+            self.print_message('success', f'اكتمل التصدير عبر Takeout: {stats.chats} محادثة، {stats.messages} رسالة')
+        self.print_export_stats(stats)
+        
+        report_file = f"{self.logs_dir}/export_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            self.serializer.dump(stats.to_dict(), f, self.json_pretty)
+        self.print_message('info', f'• التقرير: {report_file}')
+        # مثل export_messages: لا نتيجة إذا لم تنجح أي محادثة
+        return stats if succeeded else None
+    
+    async def list_group_dialogs(self):
+        """جلب المجموعات والقنوات التي ينتمي إليها الحساب"""
+        chats = []
+        async for dialog in self.current_client.iter_dialogs():
+            if dialog.is_group or dialog.is_channel:
+                chats.append(dialog.entity)
+        return chats
+    
+    async def archive_chats(self, group_links=None, limit=None, concurrency=None, export_format='jsonl',
+                            incremental=None):
+        """أرشفة عدة محادثات بالتوازي على نفس العميل بحد أقصى للتزامن"""
+        if not self.current_client:
+            self.print_message('error', 'يجب تسجيل الدخول أولاً')
+            return None
+        
+        if concurrency is None:
+            concurrency = int(self.config['SETTINGS'].get('archive_concurrency', '4'))
+        if not group_links:
+            self.print_message('progress', 'جلب قائمة المحادثات...')
+            group_links = await self.list_group_dialogs()
+        
+        scheduler = FloodWaitScheduler(concurrency)
+        # مرحلة وسائط واحدة لكل المحادثات حتى لا يُحمَّل الملف المعاد توجيهه أكثر من مرة
+        media = self.media_downloader()
+        self.print_message('progress', f'أرشفة {len(group_links)} محادثة (التزامن: {concurrency})...')
+        
+        async def archive_one(group_link):
+            async with scheduler.semaphore:
+                stats = ExportStats(mode='archive')
+                name = group_link if isinstance(group_link, str) else getattr(group_link, 'title', group_link)
+                try:
+                    await self.export_chat(group_link, limit, export_format, incremental,
+                                           stats=stats, scheduler=scheduler, media=media)
+                    return {'chat': str(name), 'status': 'ok', **stats.to_dict()}
+                except Exception as e:
+                    # فشل محادثة واحدة لا يوقف الدفعة
+                    self.print_message('error', f'فشل أرشفة {name}: {str(e)}')
+                    return {'chat': str(name), 'status': 'failed', 'error': str(e)}
+        
+        started = time.monotonic()
+        try:
+            results = await asyncio.gather(*(archive_one(link) for link in group_links))
+        except BaseException:
+            if media:
+                await media.abort()
+            raise
+        if media:
+            await self.finish_media(media)
+        
+        succeeded = [r for r in results if r['status'] == 'ok']
+        report = {
+            'total_chats': len(results),
+            'succeeded': len(succeeded),
+            'failed': len(results) - len(succeeded),
+            'messages': sum(r['messages'] for r in succeeded),
+            'concurrency': concurrency,
+            'flood_wait_seconds': scheduler.flood_wait_seconds,
+            'media': media.to_dict() if media else None,
+            'elapsed_seconds': round(time.monotonic() - started, 3),
+            'chats': results,
+            'archive_date': datetime.now().isoformat()
+        }
+        
+        report_file = f"{self.logs_dir}/archive_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        with open(report_file, 'w', encoding='utf-8') as f:
+            self.serializer.dump(report, f, self.json_pretty)
+        
+        self.print_message('success', 'اكتملت الأرشفة!')
+        self.print_message('info', f"• نجح: {report['succeeded']} محادثة")
+        self.print_message('info', f"• فشل: {report['failed']} محادثة")
+        self.print_message('info', f"• الرسائل: {report['messages']} | المدة: {report['elapsed_seconds']} ث")
+        self.print_message('info', f'• التقرير: {report_file}')
+        return report
+    
+    async def tail_chats(self, group_links, export_format=None):
+        """متابعة حية: إلحاق الرسائل الجديدة والمعدلة والمحذوفة بالأرشيف فور وصولها"""
+        from telethon import events, utils
+        
+        if not self.current_client:
+            self.print_message('error', 'يجب تسجيل الدخول أولاً')
+            return None
+        
+        client = self.current_client
+        if export_format is None:
+            export_format = self.config['SETTINGS'].get('export_format', 'json')
+        # ملف JSON واحد لا يقبل الإلحاق، لذلك تُكتب الأحداث بصيغة JSONL
+        export_format = 'sqlite' if export_format.lower() == 'sqlite' else 'jsonl'
+        gap_check = float(self.config['SETTINGS'].get('tail_gap_check', '600'))
+        stats = ExportStats(mode='tail')
+        
+        # مفاتيح الأحداث هي المعرف الكامل للمحادثة (‎-100… للقنوات)
+        groups = {}
+        for group_link in group_links:
+            group = await self.resolve_entity(group_link, stats=stats)
+            groups[utils.get_peer_id(group)] = group
+        # أرشيف SQLite هو نفس مخزن التصدير فيشاركه نقطة الاستئناف؛ أما سجل أحداث tail_<id>.jsonl
+        # فلا تقرؤه أوامر التصدير و compact و stats، فلا يجوز أن يقدّم نقطة استئناف التصدير التزايدي
+        if export_format == 'sqlite':
+            keys = {peer_id: group.id for peer_id, group in groups.items()}
+        else:
+            keys = {peer_id: f'tail_{group.id}' for peer_id, group in groups.items()}
+        checkpoints = {peer_id: self.load_checkpoint(keys[peer_id]) for peer_id in groups}
+        locks = {peer_id: asyncio.Lock() for peer_id in groups}
+        
+        if export_format == 'sqlite':
+            store = MessageArchive(self.archive_db, batch_size=1)
+        else:
+            store = TailWriter(self.exports_dir, self.serializer)
+        for group in groups.values():
+            store.upsert_chat(group.id, group.title)
+        
+        senders = self.get_sender_directory()
+        
+        def store_message(peer_id, message, event):
+            senders.observe(message)
+            edit_date = None
+            if event == 'edited' and message.edit_date:
+                edit_date = message.edit_date.isoformat()
+            store.add(groups[peer_id].id, MessageRecord.from_message(message), edit_date)
+            checkpoints[peer_id].observe(message.id)
+        
+        async def on_new(event):
+            async with locks[event.chat_id]:
+                # رسالة وصلت أثناء سد الفجوة وتمت كتابتها بالفعل
+                if event.message.id <= checkpoints[event.chat_id].max_id:
+                    return
+                store_message(event.chat_id, event.message, 'new')
+                self.save_checkpoint(keys[event.chat_id], checkpoints[event.chat_id])
+        
+        async def on_edit(event):
+            async with locks[event.chat_id]:
+                store_message(event.chat_id, event.message, 'edited')
+        
+        async def on_delete(event):
+            if event.chat_id is not None:
+                peer_ids = [event.chat_id] if event.chat_id in groups else []
             else:
-                self.print_message('warning', 'لم يتم العثور على رسائل')
+                # حذف في مجموعة عادية لا يحمل معرف المحادثة، ومعرفات رسائلها فريدة على مستوى الحساب
+                peer_ids = [peer_id for peer_id, group in groups.items() if not getattr(group, 'megagroup', False)
+                            and not getattr(group, 'broadcast', False)]
+            for peer_id in peer_ids:
+                store.mark_deleted(groups[peer_id].id, event.deleted_ids)
+        
+        async def backfill():
+            """سد الفجوة منذ آخر رسالة مخزنة لكل محادثة"""
+            for peer_id, group in groups.items():
+                async with locks[peer_id]:
+                    checkpoint = checkpoints[peer_id]
+                    if checkpoint.max_id:
+                        history = self.timed_messages(client, group, stats, min_id=checkpoint.max_id, reverse=True)
+                    else:
+                        # أول متابعة لهذه المحادثة: البدء من آخر رسالة موجودة
+                        history = self.timed_messages(client, group, stats, limit=1)
+                    count = 0
+                    async for message in history:
+                        store_message(peer_id, message, 'new')
+                        count += 1
+                    self.save_checkpoint(keys[peer_id], checkpoint)
+                    if count:
+                        self.print_message('info', f'{group.title}: سد فجوة {count} رسالة')
+        
+        chats = list(groups.values())
+        handlers = [
+            (on_new, events.NewMessage(chats=chats)),
+            (on_edit, events.MessageEdited(chats=chats)),
+            # حذف المجموعة العادية يصل بلا معرف محادثة فيسقطه فلتر chats=؛ التصفية داخل on_delete
+            (on_delete, events.MessageDeleted())
+        ]
+        for callback, event in handlers:
+            client.add_event_handler(callback, event)
+        
+        self.print_message('progress', f'متابعة {len(groups)} محادثة (Ctrl+C للإيقاف)...')
+        try:
+            while True:
+                await backfill()
+                disconnected = client.disconnected
+                # فحص دوري خفيف يلتقط فجوات إعادة الاتصال الداخلية في Telethon
+                done, _ = await asyncio.wait({disconnected}, timeout=gap_check or None)
+                if not done or client.is_connected():
+                    continue
                 
-        except Exception as e:
-            self.print_message('error', f'خطأ في جمع الرسائل: {str(e)}')
+                self.print_message('warning', 'انقطع الاتصال، إعادة الاتصال...')
+                delay = 1
+                while not client.is_connected():
+                    try:
+                        await client.connect()
+                    except OSError:
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, 300)
+                self.print_message('success', 'تمت إعادة الاتصال')
+        finally:
+            for callback, event in handlers:
+                client.remove_event_handler(callback, event)
+            store.close()
+            senders.save()
+            for peer_id in groups:
+                self.save_checkpoint(keys[peer_id], checkpoints[peer_id])
+            self.print_message('info', f'• تمت كتابة {store.count} رسالة أثناء المتابعة')
+    
+    def ask_filters(self):
+        """قراءة فلاتر التصدير من القائمة التفاعلية (كل الحقول اختيارية)"""
+        media_types = '/'.join(ExportFilters.MEDIA_TYPES)
+        return ExportFilters(
+            since=self.get_input('من تاريخ (YYYY-MM-DD)').strip() or None,
+            until=self.get_input('حتى تاريخ (YYYY-MM-DD)').strip() or None,
+            sender=self.get_input('المرسل (معرف أو اسم مستخدم)').strip() or None,
+            search=self.get_input('نص البحث').strip() or None,
+            media=self.get_input(f'نوع الوسائط ({media_types})').strip() or None,
+            oldest_first=self.get_input('من الأقدم للأحدث؟ (y/n)').lower() == 'y'
+        )
     
     async def main_menu(self):
         """القائمة الرئيسية"""
@@ -498,7 +3193,13 @@ class TelegramSuperScraper:
                 '5': 'نقل الأعضاء بين المجموعات',
                 '6': 'تصدير رسائل المجموعة',
                 '7': 'النقل السريع',
-                '8': 'الخروج'
+                '8': 'تصدير عبر Takeout',
+                '9': 'أرشفة عدة محادثات',
+                '10': 'البحث في الأرشيف',
+                '11': 'متابعة حية للرسائل',
+                '12': 'دمج ملفات التصدير المتكررة',
+                '13': 'إحصاءات الرسائل',
+                '0': 'الخروج'
             }
             
             self.print_menu('القائمة الرئيسية', menu_options)
@@ -542,7 +3243,11 @@ class TelegramSuperScraper:
                     group_link = self.get_input('أدخل رابط المجموعة')
                     limit = self.get_input('عدد الرسائل (افتراضي 1000)')
                     limit = int(limit) if limit.strip() else 1000
-                    await self.export_messages(group_link, limit)
+                    try:
+                        filters = self.ask_filters() if self.get_input('إضافة فلاتر؟ (y/n)').lower() == 'y' else None
+                        await self.export_messages(group_link, limit, filters=filters)
+                    except ValueError as e:
+                        self.print_message('error', f'فلتر غير صالح: {str(e)}')
                 else:
                     self.print_message('error', 'يجب تسجيل الدخول أولاً')
                 input("\nاضغط Enter للمتابعة...")
@@ -560,7 +3265,56 @@ class TelegramSuperScraper:
                 input("\nاضغط Enter للمتابعة...")
             
             elif choice == '8':
+                if self.current_client:
+                    links = self.get_input('روابط المجموعات (مفصولة بفاصلة)')
+                    group_links = [link.strip() for link in links.split(',') if link.strip()]
+                    limit = self.get_input('عدد الرسائل لكل مجموعة (اتركه فارغاً للجميع)')
+                    limit = int(limit) if limit.strip() else None
+                    await self.export_takeout(group_links, limit)
+                else:
+                    self.print_message('error', 'يجب تسجيل الدخول أولاً')
+                input("\nاضغط Enter للمتابعة...")
+            
+            elif choice == '9':
+                if self.current_client:
+                    links = self.get_input('روابط المجموعات (مفصولة بفاصلة، اتركه فارغاً لكل المحادثات)')
+                    group_links = [link.strip() for link in links.split(',') if link.strip()]
+                    limit = self.get_input('عدد الرسائل لكل مجموعة (اتركه فارغاً للجميع)')
+                    limit = int(limit) if limit.strip() else None
+                    await self.archive_chats(group_links, limit)
+                else:
+                    self.print_message('error', 'يجب تسجيل الدخول أولاً')
+                input("\nاضغط Enter للمتابعة...")
+            
+            elif choice == '10':
+                query = self.get_input('نص البحث')
+                since = self.get_input('من تاريخ (YYYY-MM-DD، اختياري)')
+                self.search_archive(query, since=since.strip() or None)
+                input("\nاضغط Enter للمتابعة...")
+            
+            elif choice == '11':
+                if self.current_client:
+                    links = self.get_input('روابط المجموعات (مفصولة بفاصلة)')
+                    group_links = [link.strip() for link in links.split(',') if link.strip()]
+                    await self.tail_chats(group_links)
+                else:
+                    self.print_message('error', 'يجب تسجيل الدخول أولاً')
+                input("\nاضغط Enter للمتابعة...")
+            
+            elif choice == '12':
+                keep = self.get_input('الإبقاء على الملفات الأصلية؟ (y/n)').lower() == 'y'
+                self.compact_exports(keep=keep)
+                input("\nاضغط Enter للمتابعة...")
+            
+            elif choice == '13':
+                source = self.get_input('المصدر (files/sqlite، افتراضي files)').strip().lower() or 'files'
+                self.message_statistics(source=source)
+                input("\nاضغط Enter للمتابعة...")
+            
+            elif choice == '0':
                 self.print_message('info', 'مع السلامة!')
+                self.print_debug_stats()
+                self.save_metrics()
                 if self.current_client:
                     await self.current_client.disconnect()
                 break
@@ -569,18 +3323,184 @@ class TelegramSuperScraper:
                 self.print_message('error', 'اختيار غير صحيح')
                 input("\nاضغط Enter للمتابعة...")
 
-async def main():
-    scraper = TelegramSuperScraper()
-    await scraper.main_menu()
+def measure_import_time(runs=5):
+    """قياس زمن استيراد هذا الملف في عملية منفصلة (بعد طرح زمن بدء المفسر)"""
+    import subprocess
+    module_dir = os.path.dirname(os.path.abspath(__file__))
+    
+    def best_of(code):
+        best = None
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], cwd=module_dir, check=True)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+    
+    baseline = best_of('pass')
+    with_import = best_of('import main')
+    return max(0.0, with_import - baseline) * 1000
 
-if __name__ == "__main__":
+def build_parser():
+    """بناء أوامر سطر الأوامر"""
+    parser = argparse.ArgumentParser(prog='main.py', description='Telegram Super Scraper')
+    parser.add_argument('--config', default='config.ini', help='مسار ملف الإعدادات')
+    parser.add_argument('--session', help='اسم الجلسة المحفوظة في sessions/')
+    parser.add_argument('--metrics', action='store_true', help='تسجيل قياسات الطلبات والكتابة في logs/')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    export = subparsers.add_parser('export', help='تصدير رسائل محادثة واحدة')
+    export.add_argument('chat', help='رابط أو معرف المحادثة')
+    export.add_argument('--limit', type=int, default=None, help='عدد الرسائل (الافتراضي: الكل)')
+    export.add_argument('--format', dest='export_format', choices=['json', 'jsonl', 'sqlite'])
+    export.add_argument('--incremental', action='store_true', default=None, help='تصدير تزايدي من نقطة الاستئناف')
+    export.add_argument('--takeout', action='store_true', help='التصدير عبر جلسة Takeout')
+    export.add_argument('--since', help='من تاريخ YYYY-MM-DD')
+    export.add_argument('--until', help='حتى تاريخ YYYY-MM-DD (غير شامل)')
+    export.add_argument('--sender', help='معرف أو اسم مستخدم المرسل')
+    export.add_argument('--search', help='نص يبحث عنه تليجرام داخل المحادثة')
+    export.add_argument('--media', choices=ExportFilters.MEDIA_TYPES, help='نوع الوسائط')
+    export.add_argument('--oldest-first', action='store_true', help='من الأقدم إلى الأحدث')
+    
+    archive = subparsers.add_parser('archive', help='أرشفة عدة محادثات بالتوازي')
+    archive.add_argument('chats', nargs='*', help='روابط المحادثات (الافتراضي: كل المجموعات والقنوات)')
+    archive.add_argument('--file', help='ملف يحتوي رابطاً في كل سطر')
+    archive.add_argument('--limit', type=int, default=None)
+    archive.add_argument('--concurrency', type=int, default=None)
+    archive.add_argument('--format', dest='export_format', choices=['json', 'jsonl', 'sqlite'], default='jsonl')
+    archive.add_argument('--incremental', action='store_true', default=None)
+    
+    tail = subparsers.add_parser('tail', help='متابعة حية: إلحاق الرسائل الجديدة والمعدلة والمحذوفة')
+    tail.add_argument('chats', nargs='+', help='روابط المحادثات')
+    tail.add_argument('--format', dest='export_format', choices=['jsonl', 'sqlite'])
+    
+    search = subparsers.add_parser('search', help='البحث في أرشيف SQLite')
+    search.add_argument('query', help='نص البحث (صيغة FTS5)')
+    search.add_argument('--chat-id', type=int)
+    search.add_argument('--since', help='YYYY-MM-DD')
+    search.add_argument('--until', help='YYYY-MM-DD')
+    search.add_argument('--sender', type=int)
+    search.add_argument('--limit', type=int, default=50)
+    
+    stats = subparsers.add_parser('stats', help='إحصاءات الرسائل: النشاط اليومي، المرسلون، الوسائط، أطوال النصوص')
+    stats.add_argument('chat_ids', nargs='*', type=int, help='معرفات المحادثات (الافتراضي: الكل)')
+    stats.add_argument('--source', choices=['files', 'sqlite'], default='files', help='ملفات التصدير أو أرشيف SQLite')
+    stats.add_argument('--top', type=int, default=10, help='عدد أكثر المرسلين والأيام في التقرير')
+    stats.add_argument('--summary', action='store_true', help='ملخص سريع لأرشيف SQLite فقط')
+    
+    compact = subparsers.add_parser('compact', help='دمج لقطات التصدير المتكررة لكل محادثة في ملف واحد')
+    compact.add_argument('chat_ids', nargs='*', type=int, help='معرفات المحادثات (الافتراضي: الكل)')
+    compact.add_argument('--keep', action='store_true', help='الإبقاء على الملفات الأصلية')
+    
+    expand = subparsers.add_parser('expand', help='تحويل ملف تصدير مضغوط إلى الشكل القديم')
+    expand.add_argument('file', help='ملف ‎.json أو ‎.jsonl')
+    expand.add_argument('--output', help='مسار الملف الناتج (الافتراضي: <الاسم>_legacy)')
+    
+    budget = subparsers.add_parser('import-time', help='قياس زمن بدء التشغيل ومقارنته بالحد المسموح')
+    budget.add_argument('--runs', type=int, default=5)
+    budget.add_argument('--budget-ms', type=float, default=IMPORT_TIME_BUDGET_MS)
+    
+    return parser
+
+async def run_command(args):
+    """تنفيذ أمر واحد دون واجهة تفاعلية وإرجاع رمز الخروج"""
+    scraper = TelegramSuperScraper(args.config)
+    if args.metrics:
+        metrics.configure(True)
+    
+    if args.command == 'search':
+        results = scraper.search_archive(args.query, args.chat_id, args.since, args.until, args.sender, args.limit)
+        return EXIT_OK if results else EXIT_ERROR
+    
+    if args.command == 'stats':
+        if args.summary:
+            return EXIT_OK if scraper.archive_summary() else EXIT_ERROR
+        return EXIT_OK if scraper.message_statistics(args.chat_ids, args.source, args.top) else EXIT_ERROR
+    
+    if args.command == 'compact':
+        report = scraper.compact_exports(args.chat_ids, args.keep)
+        if report is None:
+            return EXIT_ERROR
+        return EXIT_OK if all(r['status'] == 'ok' for r in report['results']) else EXIT_PARTIAL
+    
+    if args.command == 'expand':
+        return EXIT_OK if scraper.expand_export(args.file, args.output) else EXIT_ERROR
+    
+    filters = None
+    if args.command == 'export':
+        try:
+            filters = ExportFilters(args.since, args.until, args.sender, args.search, args.media, args.oldest_first)
+        except ValueError as e:
+            scraper.print_message('error', f'فلتر غير صالح: {str(e)}')
+            return EXIT_USAGE
+    
+    if not await scraper.connect_session(args.session):
+        return EXIT_AUTH
+    
+    try:
+        if args.command == 'export':
+            if args.takeout:
+                result = await scraper.export_takeout([args.chat], args.limit, args.export_format, args.incremental,
+                                                      filters)
+                if result is None:
+                    return EXIT_ERROR
+                return EXIT_PARTIAL if result.failed else EXIT_OK
+            result = await scraper.export_messages(args.chat, args.limit, args.export_format, args.incremental,
+                                                   filters=filters)
+            return EXIT_OK if result else EXIT_ERROR
+        
+        if args.command == 'archive':
+            chats = list(args.chats)
+            if args.file:
+                with open(args.file, 'r', encoding='utf-8') as f:
+                    chats.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+            report = await scraper.archive_chats(chats, args.limit, args.concurrency,
+                                                 args.export_format, args.incremental)
+            if report is None or not report['succeeded']:
+                return EXIT_ERROR
+            return EXIT_PARTIAL if report['failed'] else EXIT_OK
+        
+        if args.command == 'tail':
+            # المتابعة لا تنتهي إلا بالإيقاف أو بخطأ
+            await scraper.tail_chats(args.chats, args.export_format)
+            return EXIT_ERROR
+    finally:
+        await scraper.current_client.disconnect()
+        scraper.print_debug_stats()
+        scraper.save_metrics()
+    return EXIT_USAGE
+
+def cli(argv=None):
+    """نقطة الدخول: بدون أوامر تفتح القائمة التفاعلية"""
+    args = build_parser().parse_args(argv)
+    
+    if args.command == 'import-time':
+        elapsed = measure_import_time(args.runs)
+        within = elapsed <= args.budget_ms
+        print(f"import main: {elapsed:.1f} ms (budget {args.budget_ms:.0f} ms) {'OK' if within else 'OVER BUDGET'}")
+        return EXIT_OK if within else EXIT_ERROR
+    
+    init_colors()
+    
     # إعدادات خاصة بـ Windows
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     
     try:
-        asyncio.run(main())
+        if args.command is None:
+            asyncio.run(main())
+            return EXIT_OK
+        return asyncio.run(run_command(args))
     except KeyboardInterrupt:
         print(f"\n{Colors.RED}[!] تم إيقاف البرنامج{Colors.RESET}")
+        return EXIT_ERROR
     except Exception as e:
         print(f"\n{Colors.RED}[!] خطأ غير متوقع: {e}{Colors.RESET}")
+        return EXIT_ERROR
+
+async def main():
+    scraper = TelegramSuperScraper()
+    await scraper.main_menu()
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,24 @@
+import os
+import sys
+
+# main.py و fake_client.py في جذر المستودع
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from main import TelegramSuperScraper
+from fake_client import FakeTelegramClient
+
+
+@pytest.fixture
+def make_scraper(tmp_path, monkeypatch):
+    """مصنع أداة مسجلة بعميل وهمي داخل مجلد مؤقت؛ settings تُكتب في قسم SETTINGS وبقية الوسائط للعميل"""
+    monkeypatch.chdir(tmp_path)
+
+    def make(settings=None, **client_options):
+        scraper = TelegramSuperScraper()
+        for key, value in (settings or {}).items():
+            scraper.config['SETTINGS'][key] = str(value)
+        scraper.current_client = FakeTelegramClient(**client_options)
+        return scraper
+    return make
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from main import ArabicFormatter
+
+arabic_reshaper = pytest.importorskip('arabic_reshaper')
+bidi = pytest.importorskip('bidi.algorithm')
+
+
+def direct(text):
+    return bidi.get_display(arabic_reshaper.reshape(text))
+
+
+SAMPLES = [
+    'مرحبا بكم في المجموعة',
+    'تم جمع 1500 عضو من 3 مجموعات',
+    'الاجتماع الساعة 12:30 يوم 2024-01-15',
+    'النسبة 1.5% من 200 رسالة',
+    'الإصدار v2.0.1 صدر في 15/01/2024',
+    'تم نقل 7 من 10 أعضاء (70%) خلال 45 ثانية',
+    'hello مرحبا 42 world عالم 7',
+    'رقم الهاتف +966 50 123 4567',
+    'الأرقام الهندية ٣ و ٤٥ مع 6 و 78',
+    'السعر $19.99 بدلاً من 25.50',
+    'المعرف -1001234567890 في القائمة',
+    # أكثر من 10 سلاسل أرقام: مسار بلا ذاكرة
+    'القيم 1 2 3 4 5 6 7 8 9 10 11 12 في الجدول',
+    'من 1 إلى 2، من 3 إلى 4، من 5 إلى 6، من 7 إلى 8، من 9 إلى 10، و 11',
+    'English only 123',
+]
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_formatter_matches_direct_reshape_and_bidi(text):
+    formatter = ArabicFormatter(direct)
+    assert formatter(text) == direct(text)
+    # المرة الثانية من الذاكرة بنفس النتيجة
+    assert formatter(text) == direct(text)
+
+
+def test_template_is_shared_across_numbers():
+    formatter = ArabicFormatter(direct)
+    for count in (5, 1500, 20, 987654):
+        text = f'تم جمع {count} رسالة في {count % 7} دقائق'
+        assert formatter(text) == direct(text)
+    assert formatter.stats()['misses'] == 1
+
+
+def test_formatter_matches_on_random_mixed_text():
+    rng = random.Random(11)
+    words = ['مرحبا', 'رسالة', 'عضو', 'hello', 'file', '-', ':', '.', '/', '%', '(', ')', '،']
+    formatter = ArabicFormatter(direct, maxsize=64)
+    for _ in range(400):
+        parts = []
+        for _ in range(rng.randint(1, 14)):
+            if rng.random() < 0.4:
+                number = str(rng.randint(0, 10 ** rng.randint(1, 8)))
+                if rng.random() < 0.2:
+                    number += rng.choice('.:-/') + str(rng.randint(0, 99))
+                parts.append(number)
+            else:
+                parts.append(rng.choice(words))
+        text = rng.choice(['', ' ']).join(parts)
+        assert formatter(text) == direct(text), text
+    assert formatter.stats()['uncached']
@@ -0,0 +1,26 @@
+import json
+import asyncio
+
+CHATS = [f'chat{index}' for index in range(20)]
+MESSAGES = 3000
+
+
+def test_concurrent_incremental_archive_keeps_checkpoints_valid(make_scraper):
+    """كتّاب خلفيون متوازون يحفظون نقاط الاستئناف في نفس الملف"""
+    scraper = make_scraper({'export_flush_every': 100}, messages=MESSAGES)
+    report = asyncio.run(scraper.archive_chats(CHATS, concurrency=8, export_format='jsonl', incremental=True))
+    assert report['failed'] == 0
+    assert report['messages'] == len(CHATS) * MESSAGES
+
+    with open(scraper.checkpoints_file, 'r', encoding='utf-8') as f:
+        checkpoints = json.load(f)
+    assert len(checkpoints) == len(CHATS)
+    for checkpoint in checkpoints.values():
+        assert checkpoint['max_id'] == MESSAGES
+        assert checkpoint['min_id'] == 1
+        assert checkpoint['backfill_done']
+
+    # التشغيل التزايدي التالي يقرأ الملف ولا يجد رسائل جديدة
+    report = asyncio.run(scraper.archive_chats(CHATS, concurrency=8, export_format='jsonl', incremental=True))
+    assert report['failed'] == 0
+    assert report['messages'] == 0
@@ -0,0 +1,108 @@
+import os
+import asyncio
+
+import pytest
+
+from main import MessageRecord, iter_export
+from fake_client import FakeTelegramClient
+
+
+@pytest.fixture
+def scraper(make_scraper):
+    # دفعات صغيرة حتى يمر الدمج بعدة ملفات مؤقتة لكل لقطة
+    return make_scraper({'compact_run_size': 97}, messages=0)
+
+
+def snapshot(scraper, stamp, export_format, seed, messages, limit=None, schema='compact'):
+    """تصدير لقطة بنسخة مختلفة من النصوص (seed) ثم تسميتها بطابع زمني ثابت"""
+    client = scraper.current_client
+    client.seed, client.messages = seed, messages
+    scraper.config['SETTINGS']['export_schema'] = schema
+    before = set(os.listdir(scraper.exports_dir))
+    asyncio.run(scraper.export_chat('g', limit, export_format))
+    for name in set(os.listdir(scraper.exports_dir)) - before:
+        if name.startswith('messages_'):
+            chat_id, ext = name.split('_')[1], os.path.splitext(name)[1]
+            os.rename(os.path.join(scraper.exports_dir, name),
+                      os.path.join(scraper.exports_dir, f'messages_{chat_id}_{stamp}{ext}'))
+
+
+def expected_rows(chat_id, versions):
+    """versions: (seed، أول معرف، آخر معرف) من الأقدم للأحدث؛ النسخة الأحدث لكل رسالة تفوز"""
+    rows = {}
+    for seed, first, last in versions:
+        client = FakeTelegramClient(seed=seed)
+        for message_id in range(first, last + 1):
+            rows[message_id] = MessageRecord.from_message(client.make_message(chat_id, message_id)).to_row()
+    return [rows[message_id] for message_id in sorted(rows)]
+
+
+def exported_files(scraper):
+    return sorted(name for name in os.listdir(scraper.exports_dir) if name.startswith(('messages_', '.compact_')))
+
+
+def read_archive(path):
+    return [record.to_row() for _, record in iter_export(path)]
+
+
+def test_overlapping_snapshots_merge_sorted_with_newest_version(scraper):
+    snapshot(scraper, '20240101_000000', 'json', seed=1, messages=1000)
+    snapshot(scraper, '20240102_000000', 'jsonl', seed=2, messages=1500, limit=1000, schema='legacy')
+    snapshot(scraper, '20240103_000000', 'jsonl', seed=3, messages=2000, limit=800)
+    [chat_id] = scraper.export_snapshots()
+
+    report = scraper.compact_exports()
+    [result] = report['results']
+    assert result['status'] == 'ok'
+    assert result['rows_read'] == 1000 + 1000 + 800
+    assert result['rows_written'] == 2000
+
+    archive = os.path.join(scraper.exports_dir, f'messages_{chat_id}_archive.jsonl')
+    rows = read_archive(archive)
+    assert [row[0] for row in rows] == list(range(1, 2001))
+    assert rows == expected_rows(chat_id, [(1, 1, 1000), (2, 501, 1500), (3, 1201, 2000)])
+    # الأصول وملفاتها النصية حُذفت بعد النجاح
+    assert exported_files(scraper) == [f'messages_{chat_id}_archive.jsonl']
+
+
+def test_keep_leaves_originals(scraper):
+    snapshot(scraper, '20240101_000000', 'json', seed=1, messages=300)
+    snapshot(scraper, '20240102_000000', 'jsonl', seed=2, messages=400)
+    before = exported_files(scraper)
+
+    scraper.compact_exports(keep=True)
+    [chat_id] = scraper.export_snapshots()
+    assert exported_files(scraper) == sorted(before + [f'messages_{chat_id}_archive.jsonl'])
+
+
+def test_failed_compaction_keeps_originals(scraper):
+    snapshot(scraper, '20240101_000000', 'jsonl', seed=1, messages=500)
+    snapshot(scraper, '20240102_000000', 'json', seed=2, messages=600)
+    [(chat_id, files)] = scraper.export_snapshots().items()
+    with open(files[-1], 'r+', encoding='utf-8') as f:
+        f.truncate(os.path.getsize(files[-1]) // 2)
+    before = exported_files(scraper)
+
+    report = scraper.compact_exports()
+    assert [result['status'] for result in report['results']] == ['failed']
+    # لا أرشيف جزئي ولا ملفات مؤقتة، والأصول كما هي
+    assert exported_files(scraper) == before
+
+
+def test_recompacting_merges_new_snapshots_into_archive(scraper):
+    snapshot(scraper, '20240101_000000', 'json', seed=1, messages=1000)
+    scraper.compact_exports()
+    [chat_id] = scraper.export_snapshots()
+    archive = os.path.join(scraper.exports_dir, f'messages_{chat_id}_archive.jsonl')
+
+    # الأرشيف وحده لا يُعاد دمجه
+    report = scraper.compact_exports()
+    assert report['results'] == []
+
+    snapshot(scraper, '20240105_000000', 'jsonl', seed=4, messages=1200, limit=300)
+    report = scraper.compact_exports()
+    [result] = report['results']
+    assert result['rows_read'] == 1000 + 300
+    assert result['rows_written'] == 1200
+    assert read_archive(archive) == expected_rows(chat_id, [(1, 1, 1000), (4, 901, 1200)])
+    assert exported_files(scraper) == [f'messages_{chat_id}_archive.jsonl']
@@ -0,0 +1,64 @@
+import os
+import json
+
+import pytest
+
+from main import MessageRecord, iter_export, iter_export_rows, iter_json_batches
+from fake_client import synthetic_messages
+
+# عنوان يحوي ما يشبه مفتاح rows حتى لا يُكتشف الرأس بالخطأ داخل نص
+TITLE = 'مجموعة "rows": [1, 2] {}'
+
+
+def write_snapshot(path, compact, indent):
+    messages = list(synthetic_messages(2500, group_name=TITLE))
+    if compact:
+        data = MessageRecord.header(1001, TITLE)
+        data['rows'] = [MessageRecord.from_dict(msg).to_row() for msg in messages]
+    else:
+        data = messages
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    return data
+
+
+@pytest.mark.parametrize('compact', [True, False])
+@pytest.mark.parametrize('indent', [None, 2])
+@pytest.mark.parametrize('chunk_size', [7, 4096, 1 << 20])
+def test_json_batches_match_whole_file_load(tmp_path, compact, indent, chunk_size):
+    path = str(tmp_path / 'messages_1001_20240101_120000.json')
+    data = write_snapshot(path, compact, indent)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        batches = iter_json_batches(f, path, chunk_size, batch_size=1000)
+        header = next(batches)
+        items = [item for batch in batches for item in batch]
+
+    if compact:
+        assert header == {key: value for key, value in data.items() if key != 'rows'}
+        assert items == data['rows']
+    else:
+        assert header is None
+        assert items == data
+
+
+@pytest.mark.parametrize('compact', [True, False])
+def test_json_snapshot_readers_agree(tmp_path, compact):
+    path = str(tmp_path / 'messages_1001_20240101_120000.json')
+    write_snapshot(path, compact, None)
+
+    records = [(chat, record.to_row()) for chat, record in iter_export(path)]
+    rows = [(chat, row) for chat, batch in iter_export_rows(path, chunk_bytes=4096) for row in batch]
+    assert len(records) == 2500
+    assert rows == records
+    assert records[0][0] == {'id': 1001, 'title': TITLE}
+
+
+def test_truncated_json_snapshot_is_rejected(tmp_path):
+    path = str(tmp_path / 'messages_1001_20240101_120000.json')
+    write_snapshot(path, True, None)
+    with open(path, 'r+', encoding='utf-8') as f:
+        f.truncate(os.path.getsize(path) // 2)
+
+    with pytest.raises(ValueError):
+        list(iter_export(path))
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+import main
+
+
+def test_json_snapshot_is_written_off_the_event_loop(make_scraper, monkeypatch):
+    scraper = make_scraper({'export_format': 'json'}, messages=500)
+    threads = set()
+    dump = scraper.serializer.dump
+    render = main.render_txt_message
+
+    def recording_dump(data, f, *args, **kwargs):
+        # فقط لقطة الرسائل؛ senders.json وتقارير السجل صغيرة وتبقى على الحلقة
+        if 'messages_' in f.name:
+            threads.add(threading.get_ident())
+        return dump(data, f, *args, **kwargs)
+
+    def recording_render(*args, **kwargs):
+        threads.add(threading.get_ident())
+        return render(*args, **kwargs)
+
+    monkeypatch.setattr(scraper.serializer, 'dump', recording_dump)
+    monkeypatch.setattr(main, 'render_txt_message', recording_render)
+
+    async def run():
+        await scraper.export_chat('g', None)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert threads and loop_thread not in threads
+
+    report = scraper.message_statistics()
+    [chat] = report['chats'].values()
+    assert chat['messages'] == 500
@@ -0,0 +1,30 @@
+import os
+import asyncio
+
+import pytest
+
+MEDIA = {'download_media': 'true', 'export_format': 'jsonl'}
+
+
+def test_unresolvable_chat_starts_no_download_workers(make_scraper):
+    scraper = make_scraper(MEDIA, messages=300, missing_chats={'bad'})
+
+    async def run():
+        with pytest.raises(ValueError):
+            await scraper.export_chat('bad', None)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert not os.path.exists(os.path.join(scraper.exports_dir, 'media', 'manifest.jsonl'))
+
+
+def test_export_downloads_media_and_saves_index(make_scraper):
+    scraper = make_scraper(MEDIA, messages=300)
+
+    async def run():
+        await scraper.export_chat('good', None)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
+    assert scraper.current_client.downloads
+    assert os.path.exists(os.path.join(scraper.exports_dir, 'media', 'index.json'))
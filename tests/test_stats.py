@@ -0,0 +1,59 @@
+import asyncio
+import random
+
+import pytest
+
+from main import MessageRecord, StatsEngine
+from fake_client import synthetic_messages
+
+np = pytest.importorskip('numpy')
+
+
+def sample_rows():
+    rows = [MessageRecord.from_dict(msg).to_row() for msg in synthetic_messages(20000, seed=7)]
+    rng = random.Random(7)
+    for row in rng.sample(rows, 500):
+        # منشورات قنوات بلا مرسل، رسائل بلا تاريخ، نصوص فارغة وأطول من حد تليجرام
+        row[2] = None
+    for row in rng.sample(rows, 50):
+        row[1] = None
+    for row in rng.sample(rows, 300):
+        row[3] = ''
+    for row in rng.sample(rows, 20):
+        row[3] = 'ع' * rng.randint(4096, 6000)
+    return rows
+
+
+@pytest.mark.parametrize('chunk', [1, 997, 65536])
+def test_numpy_and_python_paths_give_identical_reports(chunk):
+    rows = sample_rows()
+    engines = {'python': StatsEngine(), 'numpy': StatsEngine(np)}
+    for engine in engines.values():
+        for start in range(0, len(rows), chunk):
+            engine.add_rows(rows[start:start + chunk])
+    assert engines['numpy'].to_dict(top=25) == engines['python'].to_dict(top=25)
+
+
+def test_per_message_and_batched_numpy_paths_agree(monkeypatch):
+    # دفعات add الصغيرة تختبر التفريغ التلقائي عند امتلاء الدفعة
+    monkeypatch.setattr(StatsEngine, 'CHUNK_SIZE', 333)
+    rows = sample_rows()
+    python, numpy = StatsEngine(), StatsEngine(np)
+    for row in rows:
+        record = MessageRecord.from_row(row)
+        python.add_record(record)
+        numpy.add_record(record)
+    assert numpy.to_dict() == python.to_dict()
+
+
+def test_stats_command_reports_match_across_backends(make_scraper):
+    scraper = make_scraper({'export_format': 'jsonl'}, messages=3000)
+    asyncio.run(scraper.export_chat('g', None))
+
+    reports = {}
+    for backend in ('python', 'numpy'):
+        scraper.config['SETTINGS']['stats_backend'] = backend
+        report = scraper.message_statistics(top=20)
+        assert report['backend'] == backend
+        reports[backend] = report['chats']
+    assert reports['numpy'] == reports['python']
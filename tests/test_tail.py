@@ -0,0 +1,72 @@
+import os
+import json
+import time
+import asyncio
+
+import pytest
+from telethon import events
+from telethon.tl.types import PeerChannel
+
+
+async def tail_briefly(scraper, export_format, updates=()):
+    """تشغيل المتابعة حتى ينتهي سد الفجوة الأول، تمرير الأحداث، ثم إيقافها كما يفعل Ctrl+C"""
+    task = asyncio.ensure_future(scraper.tail_chats(['g'], export_format))
+    while not scraper.current_client.handlers:
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.1)
+    for update in updates:
+        await scraper.current_client.dispatch(update)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+
+def test_jsonl_tail_does_not_advance_export_checkpoint(make_scraper):
+    scraper = make_scraper(messages=999)
+    asyncio.run(scraper.export_chat('g', None, 'jsonl', incremental=True))
+    scraper.current_client.messages = 1050
+    asyncio.run(tail_briefly(scraper, 'jsonl'))
+
+    # التصدير التزايدي التالي يجلب ما وصل بعده رغم أن المتابعة كتبته في سجل الأحداث
+    # (اسم اللقطة بدقة الثانية)
+    time.sleep(1)
+    stats = asyncio.run(scraper.export_chat('g', None, 'jsonl', incremental=True))
+    assert stats.messages == 51
+
+    report = scraper.message_statistics()
+    [chat] = report['chats'].values()
+    assert chat['messages'] == 1050
+
+
+def test_sqlite_tail_shares_checkpoint_with_sqlite_export(make_scraper):
+    scraper = make_scraper(messages=999)
+    asyncio.run(scraper.export_chat('g', None, 'sqlite', incremental=True))
+    scraper.current_client.messages = 1050
+    asyncio.run(tail_briefly(scraper, 'sqlite'))
+
+    # المتابعة كتبت 1000..1050 في نفس الأرشيف، فلا شيء جديد للتصدير
+    stats = asyncio.run(scraper.export_chat('g', None, 'sqlite', incremental=True))
+    assert stats.messages == 0
+    report = scraper.message_statistics(source='sqlite')
+    [chat] = report['chats'].values()
+    assert chat['messages'] == 1050
+
+
+def test_basic_group_deletions_reach_the_tail_log(make_scraper):
+    scraper = make_scraper(messages=999, basic_chats={'g'})
+    updates = [
+        # حذف في مجموعة عادية يصل بلا معرف المحادثة
+        events.MessageDeleted.Event([998, 999], None),
+        # حذف في قناة غير متابعة
+        events.MessageDeleted.Event([5], PeerChannel(424242))
+    ]
+    asyncio.run(tail_briefly(scraper, 'jsonl', updates))
+
+    [log] = [name for name in os.listdir(scraper.exports_dir) if name.startswith('tail_')]
+    log = os.path.join(scraper.exports_dir, log)
+    with open(log, 'r', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    assert [line['ids'] for line in lines if line['event'] == 'deleted'] == [[998, 999]]
+
+    # سجل الأحداث ليس ملف تصدير: أمر expand يرفضه برسالة بدل أن يتعطل
+    assert scraper.expand_export(log) is None
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def jsonl_scraper(make_scraper):
+    def make(**client_options):
+        # كل المرسلين يصلون بكيانات حتى لا يضيف حل الأسماء طلبات خارج التصدير
+        return make_scraper({'export_format': 'jsonl'}, unknown_every=0, **client_options)
+    return make
+
+
+@pytest.mark.parametrize('messages, limit', [(250, None), (200, None), (1000, 350), (0, None)])
+def test_requests_count_actual_page_fetches(jsonl_scraper, messages, limit):
+    """عدد الطلبات في التقرير هو ما أرسله العميل فعلاً، في التصدير العادي و Takeout"""
+    scraper = jsonl_scraper(messages=messages)
+    stats = asyncio.run(scraper.export_chat('plain', limit))
+    assert stats.requests == scraper.current_client.requests
+
+    scraper = jsonl_scraper(messages=messages)
+    stats = asyncio.run(scraper.export_takeout(['takeout'], limit))
+    assert stats.requests == scraper.current_client.requests
+
+
+def test_requests_include_flood_wait_retries(jsonl_scraper):
+    scraper = jsonl_scraper(messages=1000, flood_every=3, flood_seconds=0)
+    stats = asyncio.run(scraper.export_takeout(['takeout'], None))
+    assert stats.messages == 1000
+    assert stats.requests == scraper.current_client.requests
+    assert scraper.current_client.flood_waits > 0
+
+
+def test_takeout_failed_chat_finalizes_unsuccessful(jsonl_scraper):
+    scraper = jsonl_scraper(messages=300, missing_chats={'nope'})
+    assert asyncio.run(scraper.export_takeout(['nope'], None)) is None
+    assert scraper.current_client.takeout_results == [False]
+
+
+def test_takeout_partial_failure_is_reported(jsonl_scraper):
+    scraper = jsonl_scraper(messages=300, missing_chats={'nope'})
+    stats = asyncio.run(scraper.export_takeout(['good', 'nope'], None))
+    assert stats.messages == 300
+    assert [failure['chat'] for failure in stats.failed] == ['nope']
+    assert stats.to_dict()['failed'][0]['chat'] == 'nope'
+    assert scraper.current_client.takeout_results == [False]
+
+
+def test_takeout_success_finalizes_successful(jsonl_scraper):
+    scraper = jsonl_scraper(messages=300)
+    stats = asyncio.run(scraper.export_takeout(['good'], None))
+    assert not stats.failed
+    assert scraper.current_client.takeout_results == [True]